@@ -0,0 +1,64 @@
+import os
+import glob
+import argparse
+import importlib.util
+import uvicorn
+from Logs.logs import load_env
+
+def available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def prepare_multiprocess_metrics(workers: int):
+    # With several workers each process writes its metrics to files in
+    # PROMETHEUS_MULTIPROC_DIR, which /metrics aggregates. Stale files from a
+    # previous run would be counted again, so they are cleared first.
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if workers > 1 and not directory:
+        directory = os.path.join("/tmp", "prometheus-multiproc")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+
+def main():
+    # Before the defaults below read HOST, PORT, WEB_CONCURRENCY and friends.
+    load_env()
+    parser = argparse.ArgumentParser(description="Run the US Treasury API server")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="Worker processes; each one opens its own database pool")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30")),
+                        help="Seconds to let in-flight requests finish after SIGTERM")
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("KEEP_ALIVE_TIMEOUT", "5")))
+    parser.add_argument("--log-level", default=os.getenv("UVICORN_LOG_LEVEL", "info"))
+    parser.add_argument("--access-log", action="store_true", default=os.getenv("ACCESS_LOG") == "1")
+    args = parser.parse_args()
+
+    prepare_multiprocess_metrics(args.workers)
+    if args.workers > 1:
+        # Workers inherit these; see build_handler in Logs/logs.py.
+        os.environ.setdefault("LOG_TO_STDOUT", "1")
+        os.environ["LOG_PER_PROCESS"] = "1"
+    # Workers read this too, so the lifespan and the server agree on how long
+    # shutdown may take.
+    os.environ["GRACEFUL_SHUTDOWN_TIMEOUT"] = str(args.graceful_timeout)
+
+    uvicorn.run(
+        "Api.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if available("uvloop") else "asyncio",
+        http="httptools" if available("httptools") else "h11",
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keep_alive,
+        log_level=args.log_level,
+        access_log=args.access_log,
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import asyncio
+import hashlib
+from cachetools import TTLCache
+from fastapi import Request, Response
+from Api.responses import dumps
+from Data.pool import reading_from_primary
+from Logs.metrics import COALESCED_REQUESTS, observe_stage
+from Logs.logs import api_logger
+
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+
+response_cache = TTLCache(maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+# Builds currently running, by cache key, so identical concurrent misses share
+# one query. Bumping the generation on invalidation keeps builds that started
+# before it from storing or being joined.
+in_flight = {}
+cache_generation = 0
+
+def cache_key(path: str, **params) -> tuple:
+    normalized = []
+    for name, value in sorted(params.items()):
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        normalized.append((name, value))
+    return (path, tuple(normalized))
+
+def invalidate_cache():
+    global cache_generation
+    cache_generation += 1
+    in_flight.clear()
+    response_cache.clear()
+    api_logger.info("Response cache invalidated")
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+async def build_entry(key: tuple, build) -> tuple:
+    generation = cache_generation
+    with reading_from_primary():
+        body, media_type = await build()
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    entry = (etag, body, media_type)
+    if generation == cache_generation:
+        response_cache[key] = entry
+    return entry
+
+def forget_build(key: tuple, task: asyncio.Task):
+    if in_flight.get(key) is task:
+        del in_flight[key]
+    if not task.cancelled():
+        # Marks the exception as retrieved when every waiter has gone away.
+        task.exception()
+
+async def cached_entry(key: tuple, build) -> tuple:
+    entry = response_cache.get(key)
+    if entry is not None:
+        return entry
+    task = in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(build_entry(key, build))
+        in_flight[key] = task
+        task.add_done_callback(lambda done: forget_build(key, done))
+    else:
+        COALESCED_REQUESTS.inc()
+    # Shielded so one client disconnecting does not cancel the query for the
+    # others waiting on it.
+    return await asyncio.shield(task)
+
+async def cached_body(request: Request, key: tuple, build) -> Response:
+    etag, body, media_type = await cached_entry(key, build)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def json_builder(producer):
+    async def build():
+        payload = await producer()
+        with observe_stage("serialize"):
+            return dumps(payload), "application/json"
+    return build
+
+async def cached_response(request: Request, key: tuple, producer) -> Response:
+    return await cached_body(request, key, json_builder(producer))
+
+async def warm_cache(producers: dict):
+    # Builds the given JSON responses concurrently so the first requests are
+    # served from the cache. Failures are logged and left to the first request.
+    results = await asyncio.gather(
+        *(build_entry(key, json_builder(producer)) for key, producer in producers.items()),
+        return_exceptions=True
+    )
+    warmed = 0
+    for key, result in zip(producers, results):
+        if isinstance(result, Exception):
+            api_logger.warning(f"Could not warm cache entry {key[0]}: {result}")
+        else:
+            warmed += 1
+    api_logger.info(f"Warmed {warmed} of {len(producers)} cached responses")
@@ -0,0 +1,149 @@
+import io
+from typing import TYPE_CHECKING
+from fastapi import Request
+from Api.cache import cached_body, cached_response
+from Api.responses import to_columns
+from Logs.metrics import observe_stage
+
+# pyarrow is imported on first use so it does not count towards API start-up.
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+COLUMN_TYPES = {
+    "record_id": ("int32",),
+    "record_date": ("date32",),
+    "record_year": ("int32",),
+    "security_type_desc": ("string",),
+    "security_desc": ("string",),
+    "avg_interest_rate_amt": ("float64",),
+}
+# asyncpg returns NUMERIC as Decimal; build the exact array first, then cast.
+SOURCE_TYPES = {
+    "avg_interest_rate_amt": ("decimal128", 7, 5),
+}
+
+def arrow_type(spec):
+    import pyarrow as pa
+
+    name, *args = spec
+    return getattr(pa, name)(*args)
+
+def negotiate_format(request: Request, requested: str = None, default: str = "json") -> str:
+    if requested:
+        return requested
+    accept = request.headers.get("accept", "")
+    if ARROW_STREAM_MEDIA_TYPE in accept:
+        return "arrow"
+    if PARQUET_MEDIA_TYPE in accept:
+        return "parquet"
+    return default
+
+def schema_for(columns) -> "pa.Schema":
+    import pyarrow as pa
+
+    return pa.schema([(column, arrow_type(COLUMN_TYPES[column])) for column in columns])
+
+def source_type(field: "pa.Field") -> "pa.DataType":
+    spec = SOURCE_TYPES.get(field.name)
+    return arrow_type(spec) if spec else field.type
+
+def rows_to_batch(rows, schema: "pa.Schema") -> "pa.RecordBatch":
+    import pyarrow as pa
+
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array([row[field.name] for row in rows], type=source_type(field)).cast(field.type)
+            for field in schema
+        ],
+        schema=schema
+    )
+
+def arrow_stream_bytes(batch: "pa.RecordBatch") -> bytes:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+def parquet_bytes(batch: "pa.RecordBatch") -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.Table.from_batches([batch]), sink)
+    return sink.getvalue().to_pybytes()
+
+async def records_response(request: Request, key: tuple, fetch, columns, output_format: str = None,
+                           layout: str = "records"):
+    output_format = negotiate_format(request, output_format)
+
+    if output_format == "json":
+        async def producer():
+            records = await fetch()
+            return {"Record": to_columns(records, columns) if layout == "columns" else records}
+        return await cached_response(request, key + (("layout", layout),), producer)
+
+    async def build():
+        records = await fetch()
+        with observe_stage("serialize"):
+            batch = rows_to_batch(records, schema_for(columns))
+            if output_format == "parquet":
+                return parquet_bytes(batch), PARQUET_MEDIA_TYPE
+            return arrow_stream_bytes(batch), ARROW_STREAM_MEDIA_TYPE
+
+    return await cached_body(request, key + (("format", output_format),), build)
+
+async def stream_arrow(rows, columns, batch_rows: int = 5000):
+    import pyarrow as pa
+
+    schema = schema_for(columns)
+    sink = io.BytesIO()
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    writer = pa.ipc.new_stream(sink, schema)
+    yield drain()
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= batch_rows:
+            writer.write_batch(rows_to_batch(chunk, schema))
+            chunk = []
+            yield drain()
+    if chunk:
+        writer.write_batch(rows_to_batch(chunk, schema))
+    writer.close()
+    yield drain()
+
+async def stream_parquet(rows, columns, batch_rows: int = 50000):
+    import pyarrow.parquet as pq
+
+    schema = schema_for(columns)
+    sink = io.BytesIO()
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    writer = pq.ParquetWriter(sink, schema)
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= batch_rows:
+            writer.write_batch(rows_to_batch(chunk, schema))
+            chunk = []
+            yield drain()
+    if chunk:
+        writer.write_batch(rows_to_batch(chunk, schema))
+    writer.close()
+    yield drain()
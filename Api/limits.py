@@ -0,0 +1,113 @@
+import os
+import math
+import time
+import asyncio
+from fastapi import HTTPException, Request
+from Api.responses import FastJSONResponse, dumps
+from Logs.logs import api_logger
+from Logs.metrics import REJECTED_REQUESTS
+
+# Limits apply per worker process. 0 disables a limit. Admitted requests can
+# still outnumber pool connections; those wait at most DB_ACQUIRE_TIMEOUT for
+# one and are then answered by pool_timeout_handler.
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "50"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "100"))
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "64"))
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", "128"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "2"))
+OVERLOAD_RETRY_AFTER_SECONDS = 1
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        # Returns 0 when a token was taken, otherwise the seconds until one is available.
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+# Only keys that passed validation get a bucket, so this stays small.
+rate_buckets = {}
+
+def check_rate_limit(api_key: str):
+    if RATE_LIMIT_PER_SECOND <= 0:
+        return
+    bucket = rate_buckets.get(api_key)
+    if bucket is None:
+        bucket = rate_buckets[api_key] = TokenBucket(RATE_LIMIT_PER_SECOND, max(RATE_LIMIT_BURST, 1))
+    wait = bucket.take()
+    if wait:
+        REJECTED_REQUESTS.labels("rate_limited").inc()
+        raise HTTPException(
+            status_code=429, detail="Rate limit exceeded", headers={"Retry-After": str(math.ceil(wait))}
+        )
+
+async def pool_timeout_handler(request: Request, exc: Exception):
+    REJECTED_REQUESTS.labels("pool_timeout").inc()
+    api_logger.warning(f"Shedding request: {exc}")
+    return FastJSONResponse(
+        {"detail": "Server is busy, retry later"}, status_code=503,
+        headers={"Retry-After": str(OVERLOAD_RETRY_AFTER_SECONDS)}
+    )
+
+class LoadSheddingMiddleware:
+    # Caps the requests handled at once. Up to max_queued more wait at most
+    # queue_timeout for a slot; anything beyond that is answered with a fast 503
+    # instead of queueing on the database pool.
+    def __init__(self, app, max_concurrent: int = MAX_CONCURRENT_REQUESTS, max_queued: int = MAX_QUEUED_REQUESTS,
+                 queue_timeout: float = QUEUE_TIMEOUT_SECONDS, exempt_paths=("/", "/metrics")):
+        self.app = app
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.exempt_paths = set(exempt_paths)
+        self.slots = asyncio.Semaphore(max(max_concurrent, 1))
+        self.queued = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_concurrent <= 0 or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if self.slots.locked():
+            if self.queued >= self.max_queued:
+                await self.reject(send, "queue_full")
+                return
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                await self.reject(send, "queue_timeout")
+                return
+            finally:
+                self.queued -= 1
+        else:
+            await self.slots.acquire()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.slots.release()
+
+    async def reject(self, send, reason: str):
+        REJECTED_REQUESTS.labels(reason).inc()
+        api_logger.warning(f"Shedding request: {reason}")
+        body = dumps({"detail": "Server is busy, retry later"})
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(OVERLOAD_RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
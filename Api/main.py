@@ -1,24 +1,100 @@
+import io
 import os
-import sys
-from fastapi import FastAPI, Query, Depends, HTTPException, Security
+import csv
+import json
+import hmac
+import base64
+import asyncio
+import binascii
+import orjson
+from datetime import date
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, Depends, HTTPException, Request, Security
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
 from fastapi.security import APIKeyHeader
-from typing import Optional
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.append(parent_dir)
-from Data.models import *
+from Data.models import (
+    DATE_RECORD_COLUMNS, EXPORT_COLUMNS, PROJECTABLE_COLUMNS, RECORD_COLUMNS, acquire_conn, close_db_pool,
+    create_db_pool, db_logger, fetch_all_records, fetch_by_date, fetch_by_security_type,
+    fetch_by_security_type_and_date, fetch_by_type, fetch_latest_record, fetch_rate_series, fetch_records_after,
+    fetch_resampled_series, fetch_security_descs, fetch_total_records, fetch_type_counts, listen_for_updates,
+    pool_stats, stop_listening, stream_all_records, stream_records
+)
+from Data.pool import PoolTimeout
+from Data.snapshot import (
+    Snapshot, active_snapshot, load_snapshot, request_refresh, snapshot_enabled, start_periodic_reload, stop_refresh
+)
+from Api.cache import cache_key, cached_entry, cached_response, invalidate_cache, json_builder, warm_cache
+from Api.series import pivot_series, downsample, series_payload
+from Api.metrics import MetricsMiddleware
+from Api.middleware import RequestIdMiddleware
+from Api.limits import LoadSheddingMiddleware, check_rate_limit, pool_timeout_handler
+from Logs.logs import api_logger
+from Logs.metrics import mark_dead_workers, observe_stage, update_pool_gauges
+from Api.responses import FastJSONResponse, dumps, to_columns
+from Api.formats import (
+    ARROW_STREAM_MEDIA_TYPE, PARQUET_MEDIA_TYPE, negotiate_format, records_response, stream_arrow, stream_parquet
+)
+
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs before the server accepts connections: opens the pool and builds the
+    # hot cached responses. On shutdown the server has already drained
+    # in-flight requests; remaining connections get SHUTDOWN_TIMEOUT_SECONDS.
+    mark_dead_workers()
+    await create_db_pool()
+    if snapshot_enabled():
+        try:
+            await load_snapshot()
+        except Exception as e:
+            db_logger.error(f"Could not load read snapshot, serving reads from Postgres: {e}")
+        start_periodic_reload(invalidate_cache)
+    await warm_cache(WARM_RESPONSES)
+    await listen_for_updates(on_data_updated)
+    yield
+    await stop_listening()
+    await stop_refresh()
+    await close_db_pool(SHUTDOWN_TIMEOUT_SECONDS)
+    mark_dead_workers(exiting_pid=os.getpid())
+
+def on_data_updated():
+    # With the snapshot engine the cache is cleared only once the new snapshot
+    # is in place, so no response is rebuilt from the old one.
+    if snapshot_enabled():
+        request_refresh(invalidate_cache)
+    else:
+        invalidate_cache()
 
-load_dotenv()
+async def read_records(fetch, snapshot_fetch, **params):
+    snapshot = active_snapshot()
+    if snapshot is not None:
+        with observe_stage("snapshot"):
+            return snapshot_fetch(snapshot, **params)
+    async with acquire_conn() as db_connection:
+        return await fetch(conn=db_connection, **params)
+
+def record_stream(**filters):
+    snapshot = active_snapshot()
+    if snapshot is not None:
+        return snapshot.stream_records(**filters)
+    return stream_records(**filters)
 
 app = FastAPI(
     title="US treasury data",
     version="1.0.0",
-    description="Application Programming Interface for Average rate of US securities"
+    description="Application Programming Interface for Average rate of US securities",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
+# Added before CORS so shed responses still carry CORS headers and metrics.
+app.add_middleware(LoadSheddingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,119 +102,414 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+app.add_exception_handler(PoolTimeout, pool_timeout_handler)
 
 API_KEY_NAME = "API_KEY"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=True)
-API_KEY = os.getenv("API_KEY")
 
 async def validate_keys(api_key: str = Security(api_key_header)):
     expected_api_key = os.getenv("API_KEY")
-    print(f"DEBUG: Key from header: {api_key}, Key from env: {expected_api_key}")
 
-    if expected_api_key is None or api_key != expected_api_key:
+    if expected_api_key is None or not hmac.compare_digest(api_key.encode(), expected_api_key.encode()):
         raise HTTPException(status_code=401, detail="Invalid API Key")
+    check_rate_limit(api_key)
     return api_key
 
-
-@app.on_event("startup")
-async def startup_event():
-    await create_db_pool()
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    await close_db_pool()
+async def validate_metrics_access(request: Request):
+    # Scrapers may send METRICS_TOKEN as a bearer token; otherwise /metrics
+    # needs the API key like every other route. Not rate limited.
+    metrics_token = os.getenv("METRICS_TOKEN")
+    authorization = request.headers.get("authorization", "")
+    if metrics_token and hmac.compare_digest(authorization.encode(), f"Bearer {metrics_token}".encode()):
+        return
+    api_key = request.headers.get(API_KEY_NAME, "")
+    expected_api_key = os.getenv("API_KEY")
+    if expected_api_key is None or not hmac.compare_digest(api_key.encode(), expected_api_key.encode()):
+        raise HTTPException(status_code=401, detail="Invalid API Key")
 
 @app.get("/")
 async def root():
     return {"message": "Average Rate US Treasury API is running"}
 
+@app.get("/pool/stats", dependencies=[Depends(validate_keys)])
+async def database_pool_stats():
+    return pool_stats()
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(validate_metrics_access)])
+async def metrics():
+    update_pool_gauges(pool_stats())
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Several workers: aggregate the per-process metric files.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def encode_cursor(record_id: int) -> str:
+    payload = json.dumps({"record_id": record_id}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        record_id = json.loads(base64.urlsafe_b64decode(padded))["record_id"]
+        # record_id is an int4 column; bool is an int subclass and must not pass.
+        if type(record_id) is not int or not 0 <= record_id < 2**31:
+            raise ValueError("record_id must be a non-negative 32-bit integer")
+        return record_id
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def stream_records_json():
+    yield b'{"Record": ['
+    first = True
+    snapshot = active_snapshot()
+    records = snapshot.stream_records(fields=RECORD_COLUMNS) if snapshot is not None else stream_all_records()
+    async for record in records:
+        prefix = b"" if first else b","
+        first = False
+        yield prefix + dumps(record)
+    yield b"]}"
+
+FORMAT_PATTERN = "^(json|arrow|parquet)$"
+LAYOUT_PATTERN = "^(records|columns)$"
+FIELDS_DESCRIPTION = "Comma-separated list of columns to return, e.g. record_date,avg_interest_rate_amt"
+
+def parse_fields(fields: Optional[str]) -> Optional[list[str]]:
+    if not fields:
+        return None
+    selected = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in PROJECTABLE_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected or None
+
 @app.get("/records", dependencies=[Depends(validate_keys)])
 async def all_records(
-    db_connection = Depends(get_conn),
     page: int = Query(1, ge=1),
     size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor token returned by a previous page"),
     all_records: bool = Query(False, alias="all"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    layout: str = Query("records", pattern=LAYOUT_PATTERN, description="records (list of objects) or columns"),
 ):
-    skip_amount = (page - 1) * size
     if all_records:
-        records = await fetch_all_records(conn=db_connection)
-        return {"Record": records}
+        return StreamingResponse(stream_records_json(), media_type="application/json")
+
+    selected = parse_fields(fields)
+    if selected and "record_id" not in selected:
+        # record_id is needed to build next_cursor.
+        selected = ["record_id"] + selected
+
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+        records = await read_records(
+            fetch_records_after, Snapshot.fetch_records_after, after_id=after_id, limit=size, fields=selected
+        )
+        results = {"size": size}
     else:
-        records = await fetch_all_records(conn=db_connection, limit=size, offset=skip_amount)
-        results = {"Record": records, "page": page, "size": size, "offset": skip_amount}
-    return results
+        skip_amount = (page - 1) * size
+        records = await read_records(
+            fetch_all_records, Snapshot.fetch_all_records, limit=size, offset=skip_amount, fields=selected
+        )
+        results = {"page": page, "size": size, "offset": skip_amount}
 
-@app.get("/records/record_count", dependencies=[Depends(validate_keys)])
-async def total_records(
-    db_connection = Depends(get_conn)
-):
-    total_count = await fetch_total_records(conn=db_connection)
-    result = {"Record_count" : total_count}
-    return result
+    results["next_cursor"] = encode_cursor(records[-1]["record_id"]) if len(records) == size else None
+    results["Record"] = to_columns(records, selected or RECORD_COLUMNS) if layout == "columns" else records
+    return FastJSONResponse(results)
 
-@app.get("/records/latest", dependencies=[Depends(validate_keys)])
-async def latest_record(
-    db_connection = Depends(get_conn)
-):
-    record = await fetch_latest_record(conn=db_connection)
-    result = {"Record" : record}
+async def export_ndjson(rows):
+    async for row in rows:
+        yield dumps(row) + b"\n"
 
-    return result
+async def export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for row in rows:
+        writer.writerow(row.values())
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
 
-@app.get("/records/types", dependencies=[Depends(validate_keys)])
-async def get_security_types(
-    db_connection = Depends(get_conn)
+@app.get("/records/export", dependencies=[Depends(validate_keys)])
+async def export_records(
+    request: Request,
+    export_format: Optional[str] = Query(None, alias="format", pattern="^(ndjson|csv|arrow|parquet)$"),
+    security_type: Optional[str] = Query(None, description="Filter by security type description"),
+    year: Optional[int] = Query(None, description="Filter date by year (e.g YYYY)"),
+    month: Optional[int] = Query(None, description="Filter date by month (1-12)"),
+    day: Optional[int] = Query(None, description="Filter date by day (1-31)")
 ):
-    record = await fetch_by_type(conn=db_connection)
-    result = {"Security_type_desc": record}
+    export_format = negotiate_format(request, export_format, default="ndjson")
+    rows = record_stream(security_type=security_type, year=year, month=month, day=day)
+    if export_format == "csv":
+        return StreamingResponse(
+            export_csv(rows),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=avg_us_securities.csv"}
+        )
+    if export_format == "arrow":
+        return StreamingResponse(stream_arrow(rows, EXPORT_COLUMNS), media_type=ARROW_STREAM_MEDIA_TYPE)
+    if export_format == "parquet":
+        return StreamingResponse(
+            stream_parquet(rows, EXPORT_COLUMNS),
+            media_type=PARQUET_MEDIA_TYPE,
+            headers={"Content-Disposition": "attachment; filename=avg_us_securities.parquet"}
+        )
+    return StreamingResponse(export_ndjson(rows), media_type="application/x-ndjson")
+
+async def produce_record_count():
+    total_count = await read_records(fetch_total_records, Snapshot.fetch_total_records)
+    return {"Record_count" : total_count}
+
+async def produce_latest_record():
+    record = await read_records(fetch_latest_record, Snapshot.fetch_latest_record)
+    return {"Record" : record}
+
+async def produce_security_types():
+    record = await read_records(fetch_by_type, Snapshot.fetch_by_type)
+    return {"Security_type_desc": record}
+
+async def produce_type_counts():
+    async with acquire_conn() as db_connection:
+        counts = await fetch_type_counts(conn=db_connection)
+    return {"Counts": counts, "Total": sum(row["record_count"] for row in counts)}
+
+async def produce_security_descs():
+    async with acquire_conn() as db_connection:
+        securities = await fetch_security_descs(conn=db_connection)
+    return {"Securities": securities}
+
+# Parameterless responses built during start-up, before traffic is accepted.
+WARM_RESPONSES = {
+    cache_key("record_count"): produce_record_count,
+    cache_key("latest"): produce_latest_record,
+    cache_key("types"): produce_security_types,
+    cache_key("stats-counts"): produce_type_counts,
+    cache_key("stats-securities"): produce_security_descs,
+}
 
-    return result
+@app.get("/records/record_count", dependencies=[Depends(validate_keys)])
+async def total_records(request: Request):
+    return await cached_response(request, cache_key("record_count"), produce_record_count)
+
+@app.get("/records/latest", dependencies=[Depends(validate_keys)])
+async def latest_record(request: Request):
+    return await cached_response(request, cache_key("latest"), produce_latest_record)
+
+@app.get("/records/types", dependencies=[Depends(validate_keys)])
+async def get_security_types(request: Request):
+    return await cached_response(request, cache_key("types"), produce_security_types)
 
 @app.get("/records/by-date" , dependencies=[Depends(validate_keys)])
 async def get_records_date(
-    db_connection = Depends(get_conn),
+    request: Request,
     year: Optional[int] = Query(None, description="Filter date by year(e.g YYYY)"),
     month: Optional[int] = Query(None, description="Filter date by month (1-12); 1-January, 2-Febuary.... 12-December"),
-    day: Optional[int] = Query(None, description="Filter date by day (1-31)")
+    day: Optional[int] = Query(None, description="Filter date by day (1-31)"),
+    output_format: Optional[str] = Query(None, alias="format", pattern=FORMAT_PATTERN, description="json, arrow or parquet"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    layout: str = Query("records", pattern=LAYOUT_PATTERN, description="records (list of objects) or columns")
 ):
-    record = await fetch_by_date(conn=db_connection, year=year, month=month , day=day)
-    return {"Record" : record}
+    selected = parse_fields(fields)
+
+    async def fetch():
+        return await read_records(fetch_by_date, Snapshot.fetch_by_date, year=year, month=month, day=day,
+                                  fields=selected)
+
+    key = cache_key("by-date", year=year, month=month, day=day, fields=tuple(selected) if selected else None)
+    return await records_response(request, key, fetch, selected or DATE_RECORD_COLUMNS, output_format, layout)
 
 @app.get("/records/by-security-type/" , dependencies=[Depends(validate_keys)])
 async def get_records_by_security_type(
-    db_connection = Depends(get_conn),
-    security_type: str = Query(..., description="Filter by security type description i.e security_type_desc")
+    request: Request,
+    security_type: str = Query(..., description="Filter by security type description i.e security_type_desc"),
+    since: Optional[date] = Query(None, description="Only records dated after this day (YYYY-MM-DD)"),
+    output_format: Optional[str] = Query(None, alias="format", pattern=FORMAT_PATTERN, description="json, arrow or parquet"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    layout: str = Query("records", pattern=LAYOUT_PATTERN, description="records (list of objects) or columns")
 ):
+    selected = parse_fields(fields)
+
+    async def fetch():
+        return await read_records(
+            fetch_by_security_type,
+            Snapshot.fetch_by_security_type,
+            security_type=security_type,
+            fields=selected,
+            since=since
+        )
 
-    records = await fetch_by_security_type(
-        conn=db_connection,
-        security_type=security_type
+    key = cache_key(
+        "by-security-type", security_type=security_type, since=since, fields=tuple(selected) if selected else None
     )
-    results = {"Record" : records}
-    return results
+    return await records_response(request, key, fetch, selected or RECORD_COLUMNS, output_format, layout)
 
 @app.get("/records/by-security-type-and-date", dependencies=[Depends(validate_keys)])
 async def get_records_by_security_type_and_date(
-    db_connection = Depends(get_conn),
+    request: Request,
     security_type: str = Query(..., description="Filter by security type description"),
     year: Optional[int] = Query(None, description="Filter date by year (e.g YYYY)"),
     month: Optional[int] = Query(None, description="Filter date by month (1-12)"),
+    day: Optional[int] = Query(None, description="Filter date by day (1-31)"),
+    output_format: Optional[str] = Query(None, alias="format", pattern=FORMAT_PATTERN, description="json, arrow or parquet"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    layout: str = Query("records", pattern=LAYOUT_PATTERN, description="records (list of objects) or columns")
+):
+    selected = parse_fields(fields)
+
+    async def fetch():
+        return await read_records(
+            fetch_by_security_type_and_date,
+            Snapshot.fetch_by_security_type_and_date,
+            security_type=security_type,
+            year=year,
+            month=month,
+            day=day,
+            fields=selected
+        )
+
+    key = cache_key(
+        "by-security-type-and-date", security_type=security_type, year=year, month=month, day=day,
+        fields=tuple(selected) if selected else None
+    )
+    return await records_response(request, key, fetch, selected or RECORD_COLUMNS, output_format, layout)
+
+@app.get("/stats/counts", dependencies=[Depends(validate_keys)])
+async def get_type_counts(request: Request):
+    return await cached_response(request, cache_key("stats-counts"), produce_type_counts)
+
+@app.get("/stats/securities", dependencies=[Depends(validate_keys)])
+async def get_security_descs(request: Request):
+    return await cached_response(request, cache_key("stats-securities"), produce_security_descs)
+
+def rate_series_query(security_type: Optional[str], granularity: str):
+    async def produce():
+        async with acquire_conn() as db_connection:
+            series = await fetch_rate_series(conn=db_connection, security_type=security_type, granularity=granularity)
+        return {"Series": series, "granularity": granularity}
+
+    return cache_key("stats-series", security_type=security_type, granularity=granularity), produce
+
+@app.get("/stats/series", dependencies=[Depends(validate_keys)])
+async def get_rate_series(
+    request: Request,
+    security_type: Optional[str] = Query(None, description="Filter by security type description"),
+    granularity: str = Query("month", pattern="^(month|quarter|year)$", description="Bucket size: month, quarter or year")
+):
+    key, produce = rate_series_query(security_type, granularity)
+    return await cached_response(request, key, produce)
+
+def series_query(security_type: List[str], granularity: str, agg: str, max_points: Optional[int],
+                 year: Optional[int], month: Optional[int], day: Optional[int]):
+    security_types = list(dict.fromkeys(t.strip() for t in security_type))
+
+    async def produce():
+        async with acquire_conn() as db_connection:
+            rows = await fetch_resampled_series(
+                conn=db_connection,
+                security_types=security_types,
+                granularity=granularity,
+                agg=agg,
+                year=year,
+                month=month,
+                day=day
+            )
+        periods, values = pivot_series(rows, security_types)
+        periods, values = downsample(periods, values, max_points)
+        payload = series_payload(periods, values, security_types)
+        payload.update({"granularity": granularity, "agg": agg})
+        return payload
+
+    key = cache_key(
+        "series", security_type=tuple(security_types), granularity=granularity, agg=agg,
+        max_points=max_points, year=year, month=month, day=day
+    )
+    return key, produce
+
+@app.get("/series", dependencies=[Depends(validate_keys)])
+async def get_series(
+    request: Request,
+    security_type: List[str] = Query(..., description="Security type descriptions to include; repeat for several"),
+    granularity: str = Query("month", pattern="^(day|month|quarter|year)$", description="Bucket size"),
+    agg: str = Query("mean", pattern="^(mean|last|min|max)$", description="Aggregate applied within each bucket"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample to at most this many points (LTTB)"),
+    year: Optional[int] = Query(None, description="Filter date by year (e.g YYYY)"),
+    month: Optional[int] = Query(None, description="Filter date by month (1-12)"),
     day: Optional[int] = Query(None, description="Filter date by day (1-31)")
 ):
-    records = await fetch_by_security_type(conn=db_connection, security_type=security_type)
-
-    if year or month or day:
-        filtered = []
-        for record in records:
-            record_date = record.get("record_date")
-            if record_date:
-               r_year = record_date.year
-               r_month = record_date.month
-               r_day = record_date.day
-               if (year is None or r_year == year) and \
-                   (month is None or r_month == month) and \
-                   (day is None or r_day == day):
-                    filtered.append(record)
-        records = filtered
-
-    return {"Record": records}
\ No newline at end of file
+    key, produce = series_query(security_type, granularity, agg, max_points, year, month, day)
+    return await cached_response(request, key, produce)
+
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "20"))
+
+class NoParams(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+class RateSeriesParams(NoParams):
+    security_type: Optional[str] = None
+    granularity: str = Field("month", pattern="^(month|quarter|year)$")
+
+class SeriesParams(NoParams):
+    security_type: List[str] = Field(..., min_length=1)
+    granularity: str = Field("month", pattern="^(day|month|quarter|year)$")
+    agg: str = Field("mean", pattern="^(mean|last|min|max)$")
+    max_points: Optional[int] = Field(None, ge=3)
+    year: Optional[int] = None
+    month: Optional[int] = None
+    day: Optional[int] = None
+
+# Sub-queries accepted by /batch: name -> (params model, builder returning the
+# same cache key and producer as the matching GET endpoint).
+BATCH_QUERIES = {
+    "record_count": (NoParams, lambda params: (cache_key("record_count"), produce_record_count)),
+    "latest": (NoParams, lambda params: (cache_key("latest"), produce_latest_record)),
+    "types": (NoParams, lambda params: (cache_key("types"), produce_security_types)),
+    "counts": (NoParams, lambda params: (cache_key("stats-counts"), produce_type_counts)),
+    "securities": (NoParams, lambda params: (cache_key("stats-securities"), produce_security_descs)),
+    "rate_series": (RateSeriesParams, lambda params: rate_series_query(**params.model_dump())),
+    "series": (SeriesParams, lambda params: series_query(**params.model_dump())),
+}
+
+class SubQuery(BaseModel):
+    id: str = Field(..., min_length=1, description="Key of this sub-query in the response")
+    query: str = Field(..., description=f"One of: {', '.join(BATCH_QUERIES)}")
+    params: dict = Field(default_factory=dict)
+
+class BatchRequest(BaseModel):
+    queries: List[SubQuery] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+
+async def run_sub_query(sub_query: SubQuery) -> dict:
+    if sub_query.query not in BATCH_QUERIES:
+        return {"status": 404, "error": f"Unknown query: {sub_query.query}"}
+    params_model, build = BATCH_QUERIES[sub_query.query]
+    try:
+        params = params_model(**sub_query.params)
+    except ValidationError as e:
+        return {"status": 422, "error": e.errors(include_url=False, include_context=False)}
+
+    key, produce = build(params)
+    try:
+        etag, body, _ = await cached_entry(key, json_builder(produce))
+    except PoolTimeout:
+        return {"status": 503, "error": "Server is busy, retry later"}
+    except Exception as e:
+        api_logger.exception(f"Batch sub-query {sub_query.id} ({sub_query.query}) failed: {e}")
+        return {"status": 500, "error": "Sub-query failed"}
+    # The cached body is already JSON; embed it without parsing it again.
+    return {"status": 200, "etag": etag, "data": orjson.Fragment(body)}
+
+@app.post("/batch", dependencies=[Depends(validate_keys)])
+async def batch(request: BatchRequest):
+    ids = [sub_query.id for sub_query in request.queries]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Sub-query ids must be unique")
+
+    # Each sub-query acquires its own pool connection, so they run concurrently.
+    results = await asyncio.gather(*(run_sub_query(sub_query) for sub_query in request.queries))
+    return FastJSONResponse({"results": dict(zip(ids, results))})
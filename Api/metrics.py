@@ -0,0 +1,34 @@
+import time
+from Logs.metrics import IN_FLIGHT, REQUEST_LATENCY, RESPONSE_BYTES, current_scope, route_label
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_scope.set(scope)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            IN_FLIGHT.dec()
+            route = route_label(scope)
+            REQUEST_LATENCY.labels(route, scope["method"], str(status)).observe(time.perf_counter() - started)
+            RESPONSE_BYTES.labels(route).inc(size)
+            current_scope.reset(token)
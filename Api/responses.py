@@ -0,0 +1,23 @@
+import orjson
+import asyncpg
+from decimal import Decimal
+from fastapi.responses import JSONResponse
+from Logs.metrics import observe_stage
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, asyncpg.Record):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        with observe_stage("serialize"):
+            return dumps(content)
+
+def to_columns(records, columns) -> dict:
+    return {"columns": list(columns), "rows": [[record[column] for column in columns] for record in records]}
@@ -0,0 +1,83 @@
+from typing import TYPE_CHECKING
+
+# NumPy is imported inside the functions so importing the API stays cheap; it
+# is loaded by the first /series request instead of at worker start.
+if TYPE_CHECKING:
+    import numpy as np
+
+def pivot_series(rows, security_types: list[str]):
+    import numpy as np
+
+    periods = np.array(sorted({row["period"] for row in rows}), dtype="datetime64[D]")
+    values = np.full((len(security_types), len(periods)), np.nan)
+    type_index = {security_type: i for i, security_type in enumerate(security_types)}
+
+    if rows:
+        row_periods = np.array([row["period"] for row in rows], dtype="datetime64[D]")
+        columns = np.searchsorted(periods, row_periods)
+        series_rows = np.array([type_index[row["security_type_desc"]] for row in rows])
+        values[series_rows, columns] = np.array([row["value"] for row in rows], dtype=float)
+
+    return periods, values
+
+def lttb_indices(y: "np.ndarray", threshold: int) -> "np.ndarray":
+    import numpy as np
+
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    a = 0
+
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    selected[-1] = n - 1
+    return selected
+
+def downsample(periods: "np.ndarray", values: "np.ndarray", max_points: int):
+    import numpy as np
+
+    if max_points is None or len(periods) <= max_points:
+        return periods, values
+
+    # All series share one dates array, so the points are picked once from the
+    # cross-series mean (gaps interpolated) and applied to every series.
+    with np.errstate(all="ignore"):
+        envelope = np.nanmean(values, axis=0)
+    valid = ~np.isnan(envelope)
+    if not valid.any():
+        return periods[:max_points], values[:, :max_points]
+    positions = np.arange(len(envelope))
+    envelope = np.interp(positions, positions[valid], envelope[valid])
+
+    keep = lttb_indices(envelope, max_points)
+    return periods[keep], values[:, keep]
+
+def series_payload(periods: "np.ndarray", values: "np.ndarray", security_types: list[str]) -> dict:
+    import numpy as np
+
+    return {
+        "dates": periods.astype(str).tolist(),
+        "series": {
+            security_type: [None if np.isnan(v) else float(v) for v in values[i]]
+            for i, security_type in enumerate(security_types)
+        },
+    }
@@ -1,69 +1,238 @@
+import sys
+import time
+import uuid
+import argparse
 import asyncio
 import httpx
-from db_conn import insert_data, connect_to_db, db_pool
-from Logs.logs import api_logger
-from datetime import datetime
+from db_conn import (
+    bulk_insert_data, claim_resumable_run, connect_to_db, create_dead_letter_table, create_ingestion_runs_table,
+    fetch_latest_record_date, fetch_run_watermark, finish_run, insert_dead_letters, notify_data_updated,
+    refresh_summary_views, start_run
+)
+from fetcher import fetch_pages
+from transform import InvalidRecord, parse_item
+from Logs.logs import api_logger, set_correlation_id, use_log_files
+from Logs.metrics import BATCH_LATENCY, ROWS_PER_SECOND, ROWS_WRITTEN, push_ingestion_metrics
 url = "https://api.fiscaldata.treasury.gov/services/api/fiscal_service/v2/accounting/od/avg_interest_rates"
 
-async def api_insertion(batch_size=200):
-    try:
-        insertion_size = []
-        page_size = 100
-        page_num = 1
-        total_inserted = 0
+class StageStats:
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.count = 0
+        self.busy = 0.0
+
+    def add(self, count: int, seconds: float):
+        self.count += count
+        self.busy += seconds
+
+    def report(self) -> str:
+        rate = self.count / self.busy if self.busy else 0
+        return f"{self.name}: {self.count} {self.unit} in {self.busy:.2f}s busy ({rate:.0f} {self.unit}/s)"
+
+async def write_batch(batch, checkpoint=None):
+    with BATCH_LATENCY.time():
+        inserted, updated, skipped = await bulk_insert_data(batch, checkpoint=checkpoint)
+    ROWS_WRITTEN.labels("inserted").inc(inserted)
+    ROWS_WRITTEN.labels("updated").inc(updated)
+    ROWS_WRITTEN.labels("unchanged").inc(skipped)
+    return inserted, updated, skipped
+
+async def parse_stage(page_queue: asyncio.Queue, batch_queue: asyncio.Queue, stats: StageStats, batch_size=200):
+    # Every "rows" message carries the pages whose rows are all contained in
+    # that batch or an earlier one, so the writer knows what it has committed.
+    batch = []
+    pending_pages = []
+    while True:
+        message = await page_queue.get()
+        if message is None:
+            break
+
+        page_num, items = message
+        started = time.perf_counter()
+        rows = []
+        dead_letters = []
+        for item in items:
+            try:
+                rows.append(parse_item(item))
+            except InvalidRecord as e:
+                dead_letters.append((item, str(e)))
+        stats.add(len(items), time.perf_counter() - started)
+
+        if dead_letters:
+            await batch_queue.put(("dead", dead_letters, []))
 
-        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0))  as client:
-            while True:
-                params = {"page[size]": page_size, "page[number]": page_num}
-                response = await client.get(url, params=params)
+        batch.extend(rows)
+        pending_pages.append(page_num)
+        while len(batch) >= batch_size:
+            chunk, batch = batch[:batch_size], batch[batch_size:]
+            completed = pending_pages if not batch else pending_pages[:-1]
+            pending_pages = pending_pages[len(completed):]
+            await batch_queue.put(("rows", chunk, completed))
 
-                if response.status_code != 200:
-                    api_logger.error(f"API error {response.status_code}: {response.text}")
-                    break
+    if batch or pending_pages:
+        await batch_queue.put(("rows", batch, pending_pages))
+    await batch_queue.put(None)
 
-                data = response.json()
-                items = data.get("data", [])
+async def write_stage(batch_queue: asyncio.Queue, run_id: str, stats: StageStats, start_page: int = 1):
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0, "dead_lettered": 0}
+    # Pages can finish out of order, so the checkpoint only advances over a
+    # contiguous run of committed pages.
+    committed_pages = set()
+    last_committed_page = start_page - 1
 
-                if not items:
-                    api_logger.info("No more data. Ending pagination.")
-                    break
+    while True:
+        message = await batch_queue.get()
+        if message is None:
+            break
 
-                for item in items:
-                    raw_value = item['avg_interest_rate_amt']
-                    clean_value = float(raw_value.replace("%","")) / 100 if raw_value and raw_value.lower() != "null" else 0
-                    record_date = datetime.strptime(item["record_date"], "%Y-%m-%d").date()
-                    insertion_size.append((
-                        record_date,
-                        item['security_type_desc'],
-                        item['security_desc'],
-                        clean_value
-                    ))
+        kind, payload, pages = message
+        started = time.perf_counter()
+        if kind == "dead":
+            totals["dead_lettered"] += await insert_dead_letters(run_id, payload)
+            continue
 
+        # The checkpoint written with this batch covers its pages, but they only
+        # count as committed once the write has succeeded.
+        completed = committed_pages | set(pages)
+        checkpoint_page = last_committed_page
+        while checkpoint_page + 1 in completed:
+            checkpoint_page += 1
+        checkpoint = (run_id, checkpoint_page)
 
+        # Write failures (timeouts, dropped connections, serialization errors)
+        # are not the rows' fault: they fail the run so --resume retries the
+        # batch. Only rows rejected by parse_item are dead-lettered.
+        inserted, updated, skipped = await write_batch(payload, checkpoint=checkpoint)
+        committed_pages = {page for page in completed if page > checkpoint_page}
+        last_committed_page = checkpoint_page
+        stats.add(len(payload), time.perf_counter() - started)
+        api_logger.info(
+            f"Upserted batch: {inserted} inserted, {updated} updated, {skipped} unchanged "
+            f"(committed through page {last_committed_page})"
+        )
+        totals["inserted"] += inserted
+        totals["updated"] += updated
+        totals["unchanged"] += skipped
 
-                while len(insertion_size) >= batch_size:
-                    batch = insertion_size[:batch_size]
-                    await insert_data(db_pool, batch, batch_size=batch_size)
-                    api_logger.info(f"Inserted batch of {batch_size} rows")
-                    insertion_size = insertion_size[batch_size:]
-                    total_inserted += len(batch)
+    return totals
 
-                page_num += 1
-                await asyncio.sleep(1)
+async def api_insertion(batch_size=200, full=False, concurrency=4, rate=4.0, resume=False):
+    run_id = f"run-{uuid.uuid4().hex[:12]}"
+    run_started = False
+    try:
+        page_size = 100
+        start_page = 1
+        await create_dead_letter_table()
+        await create_ingestion_runs_table()
+
+        # A stable total order keeps page boundaries identical between a run
+        # and its resumption.
+        base_params = {"sort": "record_date,security_type_desc,security_desc"}
+        previous = await claim_resumable_run() if resume else None
+        if previous is not None:
+            run_id = previous["run_id"]
+            set_correlation_id(run_id)
+            page_size = previous["page_size"]
+            start_page = previous["last_committed_page"] + 1
+            since_date = previous["since_date"]
+            if since_date is not None:
+                base_params["filter"] = f"record_date:gt:{since_date.isoformat()}"
+            run_started = True
+            api_logger.info(
+                f"Resuming run {run_id} at page {start_page} "
+                f"({previous['rows_written']} rows already written)"
+            )
+        else:
+            set_correlation_id(run_id)
+            if resume:
+                api_logger.info("No interrupted run to resume. Starting a new run.")
+            since_date = None
+            if not full:
+                since_date = await fetch_run_watermark() or await fetch_latest_record_date()
+                if since_date is not None:
+                    base_params["filter"] = f"record_date:gt:{since_date.isoformat()}"
+                    api_logger.info(f"Incremental sync: fetching records newer than {since_date}")
+                else:
+                    api_logger.info("No existing records found. Running full backfill.")
+            else:
+                api_logger.info("Full backfill requested.")
+            await start_run(run_id, full, since_date, page_size)
+            run_started = True
+
+        page_queue = asyncio.Queue(maxsize=concurrency * 2)
+        batch_queue = asyncio.Queue(maxsize=4)
+        fetch_stats = StageStats("fetch", "pages")
+        parse_stats = StageStats("parse", "rows")
+        write_stats = StageStats("write", "rows")
+        started = time.perf_counter()
 
-        if insertion_size:
-            await insert_data(db_pool, insertion_size, batch_size=batch_size)
-            total_inserted += len(insertion_size)
-            api_logger.info(f"Inserted remaining {len(insertion_size)} leftover rows.")
+        async def fetch_stage():
+            fetch_started = time.perf_counter()
+            async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0))  as client:
+                total_pages = await fetch_pages(
+                    client, url, base_params, page_queue,
+                    page_size=page_size, concurrency=concurrency, rate=rate, start_page=start_page
+                )
+            fetch_stats.add(total_pages, time.perf_counter() - fetch_started)
+            api_logger.info(f"Fetched {total_pages} pages.")
+            await page_queue.put(None)
 
-        api_logger.info(f"FINISHED. Total rows inserted = {total_inserted}")
+        async with asyncio.TaskGroup() as group:
+            group.create_task(fetch_stage())
+            group.create_task(parse_stage(page_queue, batch_queue, parse_stats, batch_size=batch_size))
+            writer = group.create_task(write_stage(batch_queue, run_id, write_stats, start_page=start_page))
+        totals = writer.result()
+        elapsed = time.perf_counter() - started
+        rows_per_second = write_stats.count / elapsed if elapsed else 0
+        ROWS_PER_SECOND.set(rows_per_second)
+        api_logger.info(f"Ingestion took {elapsed:.1f}s ({rows_per_second:.0f} rows/s)")
+        for stats in (fetch_stats, parse_stats, write_stats):
+            api_logger.info(f"Stage {stats.report()}")
+
+        api_logger.info(
+            f"FINISHED. Total rows inserted = {totals['inserted']}, updated = {totals['updated']}, "
+            f"unchanged = {totals['unchanged']}, dead-lettered = {totals['dead_lettered']}"
+        )
+
+        if totals["inserted"] or totals["updated"]:
+            await refresh_summary_views()
+            await notify_data_updated(f"inserted={totals['inserted']},updated={totals['updated']}")
+        await finish_run(run_id, "succeeded")
 
     except Exception as e:
         api_logger.exception(f"Unexpected failure: {e}")
+        if run_started:
+            try:
+                errors = e.exceptions if isinstance(e, ExceptionGroup) else [e]
+                await finish_run(run_id, "failed", "; ".join(str(error) for error in errors))
+                api_logger.info(f"Run {run_id} marked as failed. Rerun with --resume to continue from the last checkpoint.")
+            except Exception as checkpoint_error:
+                api_logger.error(f"Could not record failure of run {run_id}: {checkpoint_error}")
+        raise
 
-async def main():
+    finally:
+        try:
+            if push_ingestion_metrics():
+                api_logger.info("Pushed ingestion metrics to Pushgateway")
+        except Exception as e:
+            api_logger.warning(f"Could not push ingestion metrics: {e}")
+
+async def main(full=False, concurrency=4, rate=4.0, resume=False):
     await connect_to_db()
-    await api_insertion(batch_size=200)
+    await api_insertion(batch_size=200, full=full, concurrency=concurrency, rate=rate, resume=resume)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    use_log_files("ingest")
+    parser = argparse.ArgumentParser(description="Load average interest rates from the Fiscal Data API")
+    parser.add_argument("--full", action="store_true", help="Ignore existing records and run a complete backfill")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of pages fetched in parallel")
+    parser.add_argument("--rate", type=float, default=4.0, help="Maximum API requests per second")
+    parser.add_argument("--resume", action="store_true", help="Continue the last failed or interrupted run from its checkpoint")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(full=args.full, concurrency=args.concurrency, rate=args.rate, resume=args.resume))
+    except Exception:
+        # Already logged and recorded in ingestion_runs; the exit code tells
+        # cron or a Job runner that the run failed.
+        sys.exit(1)
\ No newline at end of file
@@ -1,79 +1,299 @@
 import os
 import sys
+import json
 import asyncio
-import asyncpg
-from dotenv import load_dotenv
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
-from Logs.logs import db_logger
-load_dotenv()
+from Logs.logs import db_logger, use_log_files
+from Data.pool import DATA_UPDATED_CHANNEL, create_pools
+from Data.schema import create_schema, ensure_partitions, known_partitions
 
-db_url = os.getenv("DATABASE_URL")
 db_pool = None
+# A 'running' run whose checkpoint has not moved for this long is taken to be
+# dead and can be resumed.
+STALE_RUN_SECONDS = float(os.getenv("INGEST_STALE_RUN_SECONDS", "900"))
 
 async def connect_to_db():
     global db_pool
     if db_pool is None:
-        db_pool = await asyncpg.create_pool(db_url, min_size=1, max_size=5)
+        db_pool = await create_pools()
         db_logger.info("Connection to Database was successful")
     return db_pool
 
 async def create_tables():
-    try:
-        global db_pool
-        if db_pool is None:
-            raise Exception("DB pool not initialized. Call connect_to_db() ")
-
-        table_query = """
-            CREATE TABLE IF NOT EXISTS avg_us_securities_2001_present (
-                record_id SERIAL PRIMARY KEY,
-                record_date DATE,
-                record_year INT GENERATED ALWAYS AS (COALESCE(EXTRACT(YEAR FROM record_date)::INT, 0)) STORED,
-                security_type_desc VARCHAR(100) CHECK(security_type_desc IN('Marketable','Non-marketable','Interest-bearing Debt')),
-                security_desc VARCHAR(100),
-                avg_interest_rate_amt DECIMAL(7,5) DEFAULT 0
-            )
-        """
+    global db_pool
+    if db_pool is None:
+        raise Exception("DB pool not initialized. Call connect_to_db() ")
+
+    async with db_pool.acquire() as conn:
+        await create_schema(conn)
+
+async def prepare_partitions(rows):
+    years = {row[0].year for row in rows}
+    if years - known_partitions:
         async with db_pool.acquire() as conn:
-            await conn.execute(table_query)
-            db_logger.info("Table created successfully")
-    except Exception as e:
-        db_logger.info(f"Table not created : {e}")
+            await ensure_partitions(conn, years)
+
+SUMMARY_VIEWS = {
+    "avg_us_securities_type_counts": ("""
+        SELECT security_type_desc,
+               COUNT(*) AS record_count,
+               MIN(record_date) AS first_record_date,
+               MAX(record_date) AS last_record_date
+        FROM avg_us_securities_2001_present
+        GROUP BY security_type_desc
+    """, "security_type_desc"),
+    "avg_us_securities_descs": ("""
+        SELECT DISTINCT security_type_desc, security_desc
+        FROM avg_us_securities_2001_present
+    """, "security_type_desc, security_desc"),
+    "avg_us_securities_monthly_rates": ("""
+        SELECT date_trunc('month', record_date)::date AS month,
+               security_type_desc,
+               SUM(avg_interest_rate_amt) AS rate_sum,
+               COUNT(avg_interest_rate_amt) AS rate_count
+        FROM avg_us_securities_2001_present
+        GROUP BY 1, 2
+    """, "month, security_type_desc"),
+}
 
-async def insert_data(conn, rows, batch_size=200):
+async def create_summary_views():
+    global db_pool
+    if db_pool is None:
+        raise Exception("DB pool not initialized. Call connect_to_db() ")
+
+    async with db_pool.acquire() as conn:
+        for name, (view_query, key_columns) in SUMMARY_VIEWS.items():
+            await conn.execute(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {view_query}")
+            # A unique index is required for REFRESH ... CONCURRENTLY.
+            await conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_key ON {name} ({key_columns})")
+    db_logger.info("Summary views created successfully")
+
+async def refresh_summary_views():
     global db_pool
     if db_pool is None:
         raise Exception("DB pool not initialized. Call connect_to_db() first.")
-    total_inserted = 0
-    try:
-        insertion = """
-            INSERT INTO avg_us_securities_2001_present(
-                record_date, 
-                security_type_desc, 
-                security_desc, 
-                avg_interest_rate_amt
-            ) VALUES ($1, $2, $3, $4) ON CONFLICT DO NOTHING
-        """
 
-        for i in range(0, len(rows), batch_size):
-            batch = rows[i : i + batch_size]
+    async with db_pool.acquire() as conn:
+        for name in SUMMARY_VIEWS:
+            await conn.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}")
+    db_logger.info("Summary views refreshed")
+
+async def create_dead_letter_table():
+    global db_pool
+    if db_pool is None:
+        raise Exception("DB pool not initialized. Call connect_to_db() ")
+
+    table_query = """
+        CREATE TABLE IF NOT EXISTS avg_us_securities_dead_letters (
+            dead_letter_id SERIAL PRIMARY KEY,
+            run_id VARCHAR(64),
+            payload JSONB,
+            reason TEXT,
+            created_at TIMESTAMPTZ DEFAULT now()
+        )
+    """
+    async with db_pool.acquire() as conn:
+        await conn.execute(table_query)
+
+async def insert_dead_letters(run_id: str, entries):
+    global db_pool
+    if db_pool is None:
+        raise Exception("DB pool not initialized. Call connect_to_db() first.")
+    if not entries:
+        return 0
+
+    async with db_pool.acquire() as conn:
+        await conn.executemany(
+            "INSERT INTO avg_us_securities_dead_letters(run_id, payload, reason) VALUES ($1, $2::jsonb, $3)",
+            [(run_id, json.dumps(payload, default=str), reason) for payload, reason in entries]
+        )
+    db_logger.warning(f"Dead-lettered {len(entries)} rows for run {run_id}")
+    return len(entries)
+
+async def notify_data_updated(payload: str = ""):
+    global db_pool
+    if db_pool is None:
+        raise Exception("DB pool not initialized. Call connect_to_db() first.")
+    async with db_pool.acquire() as conn:
+        await conn.execute("SELECT pg_notify($1, $2)", DATA_UPDATED_CHANNEL, payload)
+    db_logger.info(f"Sent {DATA_UPDATED_CHANNEL} notification")
+
+async def create_ingestion_runs_table():
+    global db_pool
+    if db_pool is None:
+        raise Exception("DB pool not initialized. Call connect_to_db() ")
+
+    table_query = """
+        CREATE TABLE IF NOT EXISTS ingestion_runs (
+            run_id VARCHAR(64) PRIMARY KEY,
+            status VARCHAR(16) NOT NULL,
+            full_sync BOOLEAN NOT NULL,
+            since_date DATE,
+            page_size INT NOT NULL,
+            last_committed_page INT NOT NULL DEFAULT 0,
+            rows_written INT NOT NULL DEFAULT 0,
+            high_water_date DATE,
+            error TEXT,
+            started_at TIMESTAMPTZ DEFAULT now(),
+            updated_at TIMESTAMPTZ DEFAULT now(),
+            finished_at TIMESTAMPTZ
+        )
+    """
+    async with db_pool.acquire() as conn:
+        await conn.execute(table_query)
+
+async def start_run(run_id: str, full_sync: bool, since_date, page_size: int):
+    async with db_pool.acquire() as conn:
+        await conn.execute("""
+            INSERT INTO ingestion_runs(run_id, status, full_sync, since_date, page_size)
+            VALUES ($1, 'running', $2, $3, $4)
+        """, run_id, full_sync, since_date, page_size)
+
+async def claim_resumable_run():
+    # Only runs newer than the last successful one are worth resuming; an older
+    # one would replay a stale since_date. The row is marked running in the same
+    # statement, so two processes cannot resume the same run.
+    async with db_pool.acquire() as conn:
+        return await conn.fetchrow("""
+            UPDATE ingestion_runs
+            SET status = 'running', error = NULL, updated_at = now()
+            WHERE run_id = (
+                SELECT run_id
+                FROM ingestion_runs
+                WHERE (status = 'failed'
+                       OR (status = 'running' AND updated_at < now() - make_interval(secs => $1)))
+                  AND started_at > COALESCE(
+                      (SELECT MAX(started_at) FROM ingestion_runs WHERE status = 'succeeded'), '-infinity')
+                ORDER BY started_at DESC
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING run_id, full_sync, since_date, page_size, last_committed_page, rows_written
+        """, STALE_RUN_SECONDS)
+
+async def fetch_run_watermark():
+    async with db_pool.acquire() as conn:
+        return await conn.fetchval("""
+            SELECT high_water_date
+            FROM ingestion_runs
+            WHERE status = 'succeeded'
+            ORDER BY finished_at DESC
+            LIMIT 1
+        """)
+
+async def save_checkpoint(conn, run_id: str, last_committed_page: int, rows_written: int):
+    await conn.execute("""
+        UPDATE ingestion_runs
+        SET last_committed_page = GREATEST(last_committed_page, $2),
+            rows_written = rows_written + $3,
+            updated_at = now()
+        WHERE run_id = $1
+    """, run_id, last_committed_page, rows_written)
+
+async def finish_run(run_id: str, status: str, error: str = None):
+    async with db_pool.acquire() as conn:
+        await conn.execute("""
+            UPDATE ingestion_runs
+            SET status = $2::VARCHAR,
+                error = $3,
+                high_water_date = CASE WHEN $2::VARCHAR = 'succeeded'
+                    THEN (SELECT MAX(record_date) FROM avg_us_securities_2001_present) END,
+                finished_at = now(),
+                updated_at = now()
+            WHERE run_id = $1
+        """, run_id, status, error)
+
+async def fetch_latest_record_date():
+    global db_pool
+    if db_pool is None:
+        raise Exception("DB pool not initialized. Call connect_to_db() first.")
+    async with db_pool.acquire() as conn:
+        return await conn.fetchval("SELECT MAX(record_date) FROM avg_us_securities_2001_present")
 
+STAGING_COLUMNS = ["record_date", "security_type_desc", "security_desc", "avg_interest_rate_amt"]
+
+async def bulk_insert_data(rows, checkpoint=None):
+    global db_pool
+    if db_pool is None:
+        raise Exception("DB pool not initialized. Call connect_to_db() first.")
+    if not rows:
+        if checkpoint is not None:
             async with db_pool.acquire() as conn:
-                for row in batch:
-                    await conn.execute(insertion, *row)
-                total_inserted += len(batch)
+                await save_checkpoint(conn, *checkpoint, rows_written=0)
+        return 0, 0, 0
+
+    await prepare_partitions(rows)
+
+    staging_query = """
+        CREATE TEMP TABLE staging_avg_us_securities (
+            record_date DATE,
+            security_type_desc VARCHAR(100),
+            security_desc VARCHAR(100),
+            avg_interest_rate_amt DECIMAL(7,5)
+        ) ON COMMIT DROP
+    """
+    # Partitioned tables cannot return xmax, so inserts are counted by checking
+    # which incoming keys already existed in the snapshot the merge runs on.
+    merge_query = """
+        WITH incoming AS (
+            SELECT DISTINCT ON (record_date, security_type_desc, security_desc)
+                record_date, security_type_desc, security_desc, avg_interest_rate_amt
+            FROM staging_avg_us_securities
+            ORDER BY record_date, security_type_desc, security_desc
+        ), merged AS (
+            INSERT INTO avg_us_securities_2001_present(
+                record_date,
+                security_type_desc,
+                security_desc,
+                avg_interest_rate_amt
+            )
+            SELECT * FROM incoming
+            ON CONFLICT (record_date, security_type_desc, security_desc) DO UPDATE
+            SET avg_interest_rate_amt = EXCLUDED.avg_interest_rate_amt
+            WHERE avg_us_securities_2001_present.avg_interest_rate_amt IS DISTINCT FROM EXCLUDED.avg_interest_rate_amt
+            RETURNING 1
+        )
+        SELECT
+            (SELECT COUNT(*) FROM incoming) AS incoming,
+            (SELECT COUNT(*) FROM incoming
+             JOIN avg_us_securities_2001_present USING (record_date, security_type_desc, security_desc)) AS existing,
+            (SELECT COUNT(*) FROM merged) AS merged
+    """
 
-        return total_inserted
+    async with db_pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(staging_query)
+            try:
+                async with conn.transaction():
+                    await conn.copy_records_to_table(
+                        "staging_avg_us_securities", records=rows, columns=STAGING_COLUMNS
+                    )
+            except Exception as e:
+                db_logger.warning(f"COPY into staging failed, falling back to executemany: {e}")
+                await conn.executemany(
+                    "INSERT INTO staging_avg_us_securities VALUES ($1, $2, $3, $4)", rows
+                )
+            counts = await conn.fetchrow(merge_query)
+            if checkpoint is not None:
+                await save_checkpoint(conn, *checkpoint, rows_written=len(rows))
 
-    except Exception as e:
-        db_logger.error(f"DB insertion failed: {e}")
+    inserted = counts["incoming"] - counts["existing"]
+    updated = counts["merged"] - inserted
+    skipped = len(rows) - counts["merged"]
+    db_logger.info(f"Bulk upsert: {inserted} rows inserted, {updated} updated, {skipped} unchanged")
+    return inserted, updated, skipped
 
 
 async def main():
     await connect_to_db()
     await create_tables()
+    await create_summary_views()
+    await create_dead_letter_table()
+    await create_ingestion_runs_table()
 
 if __name__ == "__main__":
+    use_log_files("ingest")
     asyncio.run(main())
 
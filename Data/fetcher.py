@@ -0,0 +1,106 @@
+import asyncio
+import random
+import time
+import httpx
+from Logs.logs import api_logger
+from Logs.metrics import FETCH_LATENCY, FETCH_RETRIES, PAGES_FETCHED
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class FetchError(Exception):
+    pass
+
+class TokenBucket:
+    # AIMD token bucket: the refill rate is halved on every 429 and creeps back
+    # up towards max_rate on each successful request.
+    def __init__(self, rate: float, capacity: int, min_rate: float = 0.5):
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def penalize(self):
+        self.rate = max(self.min_rate, self.rate / 2)
+        api_logger.warning(f"Rate limited by API, slowing down to {self.rate:.2f} req/s")
+
+    def reward(self):
+        self.rate = min(self.max_rate, self.rate + 0.1)
+
+async def fetch_page(client: httpx.AsyncClient, url: str, params: dict, limiter: TokenBucket,
+                     max_retries: int = 5, backoff: float = 1.0) -> dict:
+    for attempt in range(max_retries + 1):
+        await limiter.acquire()
+        started = time.perf_counter()
+        try:
+            response = await client.get(url, params=params)
+        except httpx.TransportError as e:
+            FETCH_LATENCY.labels("error").observe(time.perf_counter() - started)
+            error = f"transport error: {e}"
+            reason = "transport"
+            retry_after = None
+        else:
+            FETCH_LATENCY.labels(str(response.status_code)).observe(time.perf_counter() - started)
+            if response.status_code == 200:
+                limiter.reward()
+                PAGES_FETCHED.inc()
+                return response.json()
+            if response.status_code not in RETRY_STATUS_CODES:
+                raise FetchError(f"API error {response.status_code}: {response.text}")
+            if response.status_code == 429:
+                limiter.penalize()
+            error = f"API error {response.status_code}"
+            reason = str(response.status_code)
+            retry_after = response.headers.get("Retry-After")
+
+        if attempt == max_retries:
+            raise FetchError(f"Giving up on page {params.get('page[number]')} after {max_retries} retries: {error}")
+
+        FETCH_RETRIES.labels(reason).inc()
+        delay = backoff * 2 ** attempt + random.uniform(0, backoff)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        api_logger.warning(
+            f"Page {params.get('page[number]')} failed ({error}); retry {attempt + 1}/{max_retries} in {delay:.1f}s"
+        )
+        await asyncio.sleep(delay)
+
+async def fetch_pages(client: httpx.AsyncClient, url: str, base_params: dict, queue: asyncio.Queue,
+                      page_size: int = 100, concurrency: int = 4, rate: float = 4.0, start_page: int = 1):
+    limiter = TokenBucket(rate=rate, capacity=concurrency)
+
+    first = await fetch_page(client, url, {**base_params, "page[size]": page_size, "page[number]": start_page}, limiter)
+    total_pages = first.get("meta", {}).get("total-pages", 0)
+    api_logger.info(f"API reports {total_pages} pages of {page_size} records, starting at page {start_page}")
+    await queue.put((start_page, first.get("data", [])))
+
+    pages = iter(range(start_page + 1, total_pages + 1))
+
+    async def worker():
+        for page_num in pages:
+            data = await fetch_page(
+                client, url, {**base_params, "page[size]": page_size, "page[number]": page_num}, limiter
+            )
+            await queue.put((page_num, data.get("data", [])))
+
+    async with asyncio.TaskGroup() as group:
+        for _ in range(min(concurrency, max(total_pages - start_page, 0))):
+            group.create_task(worker())
+
+    return total_pages
@@ -1,124 +1,367 @@
-import asyncpg
 import os
-import sys
-from dotenv import load_dotenv
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.append(parent_dir)
+import asyncio
+import asyncpg
+from datetime import date, timedelta
 from Logs.logs import db_logger
-load_dotenv()
-db_url = os.getenv("DATABASE_URL")
+from Logs.metrics import observe_stage
+from Data.pool import DATA_UPDATED_CHANNEL, acquire, create_pools, close_pools, database_url, pool_stats
+
+listener_conn = None
+listener_task = None
+listener_lost = None
 
-db_pool = None
+LISTENER_RETRY_SECONDS = float(os.getenv("LISTENER_RETRY_SECONDS", "1"))
+LISTENER_MAX_RETRY_SECONDS = float(os.getenv("LISTENER_MAX_RETRY_SECONDS", "60"))
+
+RECORD_COLUMNS = ["record_id", "record_date", "record_year", "security_type_desc", "security_desc", "avg_interest_rate_amt"]
+DATE_RECORD_COLUMNS = ["record_date", "security_type_desc", "security_desc", "avg_interest_rate_amt"]
+PROJECTABLE_COLUMNS = set(RECORD_COLUMNS)
+EXPORT_COLUMNS = ["record_id", "record_date", "security_type_desc", "security_desc", "avg_interest_rate_amt"]
 
 async def create_db_pool():
-    global db_pool
-    if db_pool is None:
-        try:
-            db_pool = await asyncpg.create_pool(db_url, min_size=1, max_size=5)
-            db_logger.info("Database pool created successfully.")
-        except Exception as e:
-            db_logger.error(f"Failed to create database pool: {e}")
-            raise e
-
-async def close_db_pool():
-    global db_pool
-    if db_pool:
-        await db_pool.close()
-        db_logger.info("Database pool closed.")
-        db_pool = None
-
-async def get_conn():
-    if db_pool is None:
-        await create_db_pool()
+    await create_pools()
+
+async def close_db_pool(timeout: float = None):
+    await close_pools(timeout)
+
+def acquire_conn(read: bool = True):
+    return acquire(read=read)
+
+async def timed_fetch(conn, query, *params):
+    with observe_stage("db"):
+        return await conn.fetch(query, *params)
+
+def to_dicts(rows) -> list[dict]:
+    with observe_stage("convert"):
+        return [dict(row) for row in rows]
+
+async def connect_listener(callback):
+    global listener_conn
+
+    def on_notify(connection, pid, channel, payload):
+        db_logger.info(f"Received {channel} notification: {payload}")
+        callback()
+
+    def on_terminate(connection):
+        if listener_conn is not connection:
+            return
+        db_logger.warning("Update listener connection lost; reconnecting")
+        listener_lost.set()
+
+    conn = await asyncpg.connect(database_url())
     try:
-        async with db_pool.acquire() as connection:
-            yield connection
+        await conn.add_listener(DATA_UPDATED_CHANNEL, on_notify)
+    except Exception:
+        await conn.close()
+        raise
+    conn.add_termination_listener(on_terminate)
+    listener_conn = conn
+    db_logger.info(f"Listening for data updates on channel {DATA_UPDATED_CHANNEL}")
+
+async def keep_listening(callback):
+    global listener_conn
+    while True:
+        await listener_lost.wait()
+        listener_lost.clear()
+        listener_conn = None
+        delay = LISTENER_RETRY_SECONDS
+        while listener_conn is None:
+            await asyncio.sleep(delay)
+            try:
+                await connect_listener(callback)
+            except Exception as e:
+                delay = min(delay * 2, LISTENER_MAX_RETRY_SECONDS)
+                db_logger.warning(f"Could not reconnect update listener, retrying in {delay:.0f}s: {e}")
+        # Updates committed while disconnected were never announced.
+        callback()
+
+async def listen_for_updates(callback):
+    # Connects now and keeps a background task that reconnects with
+    # exponential backoff whenever the connection drops or never came up.
+    global listener_task, listener_lost
+    if listener_task is not None:
+        return
+    listener_lost = asyncio.Event()
+    try:
+        await connect_listener(callback)
     except Exception as e:
-        db_logger.error(f"Failed to acquire connection from pool: {e}")
-        raise e
+        db_logger.error(f"Could not start update listener, retrying in the background: {e}")
+        listener_lost.set()
+    listener_task = asyncio.create_task(keep_listening(callback))
 
-async def fetch_all_records(conn, limit: int, offset: int) ->dict:
+async def stop_listening():
+    global listener_conn, listener_task
+    if listener_task is not None:
+        listener_task.cancel()
+        try:
+            await listener_task
+        except asyncio.CancelledError:
+            pass
+        listener_task = None
+    if listener_conn:
+        conn, listener_conn = listener_conn, None
+        await conn.close()
 
-    rows = await conn.fetch("""
-        SELECT *
+def select_list(fields=None) -> str:
+    if not fields:
+        return "*"
+    unknown = [field for field in fields if field not in PROJECTABLE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return ", ".join(fields)
+
+async def fetch_all_records(conn, limit: int, offset: int, fields=None) ->dict:
+
+    rows = await timed_fetch(conn, f"""
+        SELECT {select_list(fields)}
         FROM avg_us_securities_2001_present
         ORDER BY record_id ASC
         LIMIT $1 OFFSET $2 
         
     """, limit, offset)
 
-    return [dict(row) for row in rows]
+    return to_dicts(rows)
 
-async def fetch_latest_record(conn) -> list[dict]:
+async def fetch_records_after(conn, after_id: int, limit: int, fields=None) -> list[dict]:
 
-    rows = await conn.fetchrow("""
-        SELECT *
+    rows = await timed_fetch(conn, f"""
+        SELECT {select_list(fields)}
         FROM avg_us_securities_2001_present
-        ORDER BY record_id DESC
-        LIMIT 1
-    """)
+        WHERE record_id > $1
+        ORDER BY record_id ASC
+        LIMIT $2
+    """, after_id, limit)
+
+    return to_dicts(rows)
+
+async def stream_all_records(page_size: int = 1000):
+    after_id = 0
+    while True:
+        async with acquire_conn() as conn:
+            records = await fetch_records_after(conn, after_id=after_id, limit=page_size)
+        if not records:
+            break
+        for record in records:
+            yield record
+        if len(records) < page_size:
+            break
+        after_id = records[-1]["record_id"]
+
+async def fetch_latest_record(conn) -> list[dict]:
+
+    with observe_stage("db"):
+        rows = await conn.fetchrow("""
+            SELECT *
+            FROM avg_us_securities_2001_present
+            ORDER BY record_id DESC
+            LIMIT 1
+        """)
 
     return rows
 
 async def fetch_total_records(conn) -> int:
-    rows = await conn.fetchrow(
-        """
-        SELECT COUNT(*) as total_records
-        FROM 
-        avg_us_securities_2001_present ;
-        """
-    )
+    with observe_stage("db"):
+        rows = await conn.fetchrow(
+            """
+            SELECT COUNT(*) as total_records
+            FROM 
+            avg_us_securities_2001_present ;
+            """
+        )
     return rows
 
-async def fetch_by_security_type(conn, security_type: str) -> list[dict]:
-    security_type = security_type.strip()
+async def fetch_by_security_type(conn, security_type: str, fields=None, since=None) -> list[dict]:
+    conditions, params = build_record_filters(security_type=security_type, since=since)
 
-    rows = await conn.fetch("""
-        SELECT * 
+    rows = await timed_fetch(conn, f"""
+        SELECT {select_list(fields)}
         FROM avg_us_securities_2001_present 
-        WHERE security_type_desc = $1
+        WHERE {' AND '.join(conditions)}
+        ORDER BY record_id ASC
+    """, *params)
+
+    return to_dicts(rows)
+
+async def fetch_by_date(conn, year=None, month=None, day=None, fields=None) -> list[dict]:
+    conditions, params = build_record_filters(year=year, month=month, day=day)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    rows = await timed_fetch(conn, f"""
+        SELECT {select_list(fields or DATE_RECORD_COLUMNS)}
+        FROM avg_us_securities_2001_present
+        {where}
+        ORDER BY record_date DESC
+    """, *params)
+
+    return to_dicts(rows)
+
+async def fetch_by_security_type_and_date(conn, security_type: str, year=None, month=None, day=None,
+                                          fields=None) -> list[dict]:
+    conditions, params = build_record_filters(security_type=security_type, year=year, month=month, day=day)
+
+    rows = await timed_fetch(conn, f"""
+        SELECT {select_list(fields)}
+        FROM avg_us_securities_2001_present
+        WHERE {' AND '.join(conditions)}
         ORDER BY record_id ASC
-    """, security_type)
+    """, *params)
 
-    return [dict(row) for row in rows]
-async def fetch_by_date(conn, year=None, month=None, day=None) -> list[dict]:
+    return to_dicts(rows)
 
-    query_parts = [
-        "SELECT record_date, security_type_desc, security_desc, avg_interest_rate_amt",
-        "FROM avg_us_securities_2001_present",
-        "WHERE 1=1"
-    ]
+async def fetch_by_type(conn):
+    rows = await timed_fetch(conn, """
+        SELECT DISTINCT security_type_desc 
+        FROM avg_us_securities_2001_present
+        ORDER BY security_type_desc
+    """)
+    return [row[0] for row in rows]
+
+def date_range(year, month=None, day=None):
+    try:
+        if month is None:
+            return date(year, 1, 1), date(year + 1, 1, 1)
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        if day is None:
+            return start, end
+        start = date(year, month, day)
+        return start, start + timedelta(days=1)
+    except ValueError:
+        return None
+
+def build_record_filters(security_type=None, year=None, month=None, day=None, param_index=1, since=None):
+    # Year-anchored filters become half-open record_date ranges so the planner
+    # can prune to the matching yearly partition and use the
+    # (security_type_desc, record_date) index. Month/day without a year cannot
+    # be expressed as one range and fall back to EXTRACT across all partitions.
+    # since keeps only records dated after that day (delta downloads).
+    conditions = []
     params = []
-    param_index = 1
 
-    if year is not None:
-        query_parts.append(f" AND record_year = ${param_index}")
-        params.append(int(year))
+    if security_type is not None:
+        conditions.append(f"security_type_desc = ${param_index}")
+        params.append(security_type.strip())
         param_index += 1
 
+    if since is not None:
+        conditions.append(f"record_date > ${param_index}")
+        params.append(since)
+        param_index += 1
+
+    if year is not None:
+        bounds = date_range(int(year), int(month) if month is not None else None,
+                            int(day) if day is not None and month is not None else None)
+        if bounds is None:
+            conditions.append("FALSE")
+            return conditions, params
+        conditions.append(f"record_date >= ${param_index} AND record_date < ${param_index + 1}")
+        params.extend(bounds)
+        param_index += 2
+        if month is not None:
+            month = None
+            day = None
+
     if month is not None:
-        query_parts.append(f" AND EXTRACT(MONTH FROM record_date) = ${param_index}")
+        conditions.append(f"EXTRACT(MONTH FROM record_date) = ${param_index}")
         params.append(int(month))
         param_index += 1
 
     if day is not None:
-        query_parts.append(f" AND EXTRACT(DAY FROM record_date) = ${param_index}")
+        conditions.append(f"EXTRACT(DAY FROM record_date) = ${param_index}")
         params.append(int(day))
         param_index += 1
 
-    query_parts.append("ORDER BY record_date DESC")
+    return conditions, params
 
-    query = " ".join(query_parts)
+async def stream_records(security_type=None, year=None, month=None, day=None, prefetch: int = 500):
+    conditions, params = build_record_filters(security_type, year, month, day)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT {', '.join(EXPORT_COLUMNS)}
+        FROM avg_us_securities_2001_present
+        {where}
+        ORDER BY record_id ASC
+    """
 
-    rows = await conn.fetch(query, *params)
+    async with acquire_conn() as conn:
+        async with conn.transaction(readonly=True):
+            async for row in conn.cursor(query, *params, prefetch=prefetch):
+                yield row
 
-    return [dict(row) for row in rows]
+SERIES_GRANULARITIES = ("month", "quarter", "year")
 
-async def fetch_by_type(conn):
-    rows = await conn.fetch("""
-        SELECT DISTINCT security_type_desc 
-        FROM avg_us_securities_2001_present
+async def fetch_type_counts(conn) -> list[dict]:
+    rows = await timed_fetch(conn, """
+        SELECT security_type_desc, record_count, first_record_date, last_record_date
+        FROM avg_us_securities_type_counts
         ORDER BY security_type_desc
     """)
-    return [row[0] for row in rows]
+    return to_dicts(rows)
+
+async def fetch_security_descs(conn) -> dict:
+    rows = await timed_fetch(conn, """
+        SELECT security_type_desc, security_desc
+        FROM avg_us_securities_descs
+        ORDER BY security_type_desc, security_desc
+    """)
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row["security_type_desc"], []).append(row["security_desc"])
+    return grouped
+
+async def fetch_rate_series(conn, security_type=None, granularity: str = "month") -> list[dict]:
+    if granularity not in SERIES_GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+
+    conditions, params = [], [granularity]
+    if security_type is not None:
+        conditions.append("security_type_desc = $2")
+        params.append(security_type.strip())
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    rows = await timed_fetch(conn, f"""
+        SELECT date_trunc($1, month)::date AS period,
+               security_type_desc,
+               SUM(rate_sum) / NULLIF(SUM(rate_count), 0) AS avg_interest_rate_amt
+        FROM avg_us_securities_monthly_rates
+        {where}
+        GROUP BY period, security_type_desc
+        ORDER BY security_type_desc, period
+    """, *params)
+    return to_dicts(rows)
+
+SERIES_AGGREGATES = {
+    "mean": "AVG(rate)",
+    "min": "MIN(rate)",
+    "max": "MAX(rate)",
+    "last": "(array_agg(rate ORDER BY record_date DESC))[1]",
+}
+
+async def fetch_resampled_series(conn, security_types: list[str], granularity: str = "day", agg: str = "mean",
+                                 year=None, month=None, day=None) -> list:
+    if granularity not in ("day",) + SERIES_GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+    if agg not in SERIES_AGGREGATES:
+        raise ValueError(f"Unsupported aggregate: {agg}")
+
+    conditions, params = build_record_filters(year=year, month=month, day=day, param_index=3)
+    conditions.insert(0, "security_type_desc = ANY($2::text[])")
+    params = [granularity, [t.strip() for t in security_types]] + params
+
+    # Securities are averaged per day first so every type contributes one value
+    # per record_date, then the daily values are aggregated into buckets.
+    rows = await timed_fetch(conn, f"""
+        WITH daily AS (
+            SELECT record_date, security_type_desc, AVG(avg_interest_rate_amt)::float8 AS rate
+            FROM avg_us_securities_2001_present
+            WHERE {' AND '.join(conditions)}
+            GROUP BY record_date, security_type_desc
+        )
+        SELECT date_trunc($1, record_date)::date AS period,
+               security_type_desc,
+               {SERIES_AGGREGATES[agg]} AS value
+        FROM daily
+        GROUP BY period, security_type_desc
+        ORDER BY period
+    """, *params)
+    return rows
@@ -0,0 +1,156 @@
+import os
+import time
+import asyncio
+import asyncpg
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from Logs.logs import db_logger
+
+DATA_UPDATED_CHANNEL = "avg_us_securities_updated"
+
+ACQUIRE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+primary_pool = None
+read_pool = None
+# Set while building data that outlives the request (cached responses, read
+# snapshots). Those run right after a NOTIFY from the primary, when a lagging
+# replica could still return the old rows and pin them for a whole TTL.
+primary_only: ContextVar = ContextVar("primary_only", default=False)
+
+class PoolTimeout(Exception):
+    pass
+
+def database_url() -> str:
+    return os.getenv("DATABASE_URL")
+
+def read_database_url() -> str:
+    return os.getenv("DATABASE_READ_URL")
+
+def pool_settings() -> dict:
+    return {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "5")),
+        "statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+        "max_inactive_connection_lifetime": float(os.getenv("DB_MAX_INACTIVE_CONNECTION_LIFETIME", "300")),
+        "command_timeout": float(os.getenv("DB_COMMAND_TIMEOUT", "30")),
+    }
+
+def acquire_timeout() -> float:
+    # Seconds a caller waits for a free connection before PoolTimeout. 0 waits forever.
+    return float(os.getenv("DB_ACQUIRE_TIMEOUT", "5"))
+
+class PoolMetrics:
+    def __init__(self):
+        self.waiting = 0
+        self.in_use = 0
+        self.acquired = 0
+        self.acquire_failures = 0
+        self.acquire_seconds_sum = 0.0
+        self.acquire_buckets = [0] * len(ACQUIRE_BUCKETS)
+
+    def observe_acquire(self, seconds: float):
+        self.acquired += 1
+        self.acquire_seconds_sum += seconds
+        for i, bound in enumerate(ACQUIRE_BUCKETS):
+            if seconds <= bound:
+                self.acquire_buckets[i] += 1
+
+    def snapshot(self, pool) -> dict:
+        size = pool.get_size() if pool else 0
+        idle = pool.get_idle_size() if pool else 0
+        return {
+            "size": size,
+            "idle": idle,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "acquire_failures": self.acquire_failures,
+            "acquire_seconds_sum": self.acquire_seconds_sum,
+            "acquire_seconds_buckets": dict(zip(map(str, ACQUIRE_BUCKETS), self.acquire_buckets)),
+        }
+
+metrics = {"primary": PoolMetrics(), "read": PoolMetrics()}
+
+async def create_pools():
+    global primary_pool, read_pool
+    settings = pool_settings()
+    if primary_pool is None:
+        try:
+            primary_pool = await asyncpg.create_pool(database_url(), **settings)
+            db_logger.info(f"Database pool created successfully ({settings['min_size']}-{settings['max_size']} connections).")
+        except Exception as e:
+            db_logger.error(f"Failed to create database pool: {e}")
+            raise e
+    if read_pool is None and read_database_url():
+        try:
+            read_pool = await asyncpg.create_pool(read_database_url(), **settings)
+            db_logger.info("Read replica pool created successfully.")
+        except Exception as e:
+            db_logger.error(f"Failed to create read replica pool, reads will use the primary: {e}")
+    return primary_pool
+
+async def close_pools(timeout: float = None):
+    # Waits up to `timeout` seconds for checked-out connections to be released
+    # before terminating them.
+    global primary_pool, read_pool
+    for pool in (read_pool, primary_pool):
+        if pool:
+            try:
+                await asyncio.wait_for(pool.close(), timeout)
+            except asyncio.TimeoutError:
+                db_logger.warning(f"Connections still in use after {timeout}s, terminating pool")
+                pool.terminate()
+    if primary_pool:
+        db_logger.info("Database pool closed.")
+    primary_pool = None
+    read_pool = None
+
+def get_pool(read: bool = False):
+    if read and read_pool is not None and not primary_only.get():
+        return "read", read_pool
+    return "primary", primary_pool
+
+@contextmanager
+def reading_from_primary():
+    token = primary_only.set(True)
+    try:
+        yield
+    finally:
+        primary_only.reset(token)
+
+@asynccontextmanager
+async def acquire(read: bool = False):
+    if primary_pool is None:
+        await create_pools()
+    name, pool = get_pool(read)
+    pool_metrics = metrics[name]
+
+    pool_metrics.waiting += 1
+    started = time.perf_counter()
+    timeout = acquire_timeout()
+    try:
+        connection = await pool.acquire(timeout=timeout or None)
+    except asyncio.TimeoutError:
+        pool_metrics.acquire_failures += 1
+        db_logger.warning(f"No {name} pool connection free after {timeout}s")
+        raise PoolTimeout(f"No {name} pool connection free after {timeout}s") from None
+    except Exception as e:
+        pool_metrics.acquire_failures += 1
+        db_logger.error(f"Failed to acquire connection from pool: {e}")
+        raise e
+    finally:
+        pool_metrics.waiting -= 1
+    pool_metrics.observe_acquire(time.perf_counter() - started)
+
+    pool_metrics.in_use += 1
+    try:
+        yield connection
+    finally:
+        pool_metrics.in_use -= 1
+        await pool.release(connection)
+
+def pool_stats() -> dict:
+    stats = {"primary": metrics["primary"].snapshot(primary_pool)}
+    if read_pool is not None:
+        stats["read"] = metrics["read"].snapshot(read_pool)
+    return stats
@@ -0,0 +1,124 @@
+from Logs.logs import db_logger
+
+TABLE = "avg_us_securities_2001_present"
+LEGACY_TABLE = "avg_us_securities_legacy"
+PARTITION_PREFIX = "avg_us_securities_y"
+
+# Partitions that are known to exist, so ingestion only issues DDL for new years.
+known_partitions = set()
+
+def partition_name(year: int) -> str:
+    return f"{PARTITION_PREFIX}{year}"
+
+async def is_partitioned(conn) -> bool:
+    return bool(await conn.fetchval("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass($1)", TABLE))
+
+async def create_partitioned_table(conn):
+    # The primary key and the natural key must contain the partition key, so
+    # record_date is NOT NULL and part of both.
+    await conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            record_id SERIAL,
+            record_date DATE NOT NULL,
+            record_year INT GENERATED ALWAYS AS (COALESCE(EXTRACT(YEAR FROM record_date)::INT, 0)) STORED,
+            security_type_desc VARCHAR(100) CHECK(security_type_desc IN('Marketable','Non-marketable','Interest-bearing Debt')),
+            security_desc VARCHAR(100),
+            avg_interest_rate_amt DECIMAL(7,5) DEFAULT 0,
+            PRIMARY KEY (record_id, record_date)
+        ) PARTITION BY RANGE (record_date)
+    """)
+
+async def create_indexes(conn):
+    # Indexes on the parent are created on every current and future partition.
+    await conn.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS avg_us_securities_natural_key
+        ON {TABLE} (record_date, security_type_desc, security_desc)
+    """)
+    await conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_avg_us_securities_type_date
+        ON {TABLE} (security_type_desc, record_date)
+    """)
+    await conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_avg_us_securities_date_brin
+        ON {TABLE} USING BRIN (record_date)
+    """)
+
+async def ensure_partitions(conn, years):
+    missing = sorted(set(years) - known_partitions)
+    for year in missing:
+        await conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {partition_name(year)}
+            PARTITION OF {TABLE}
+            FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')
+        """)
+        known_partitions.add(year)
+    if missing:
+        db_logger.info(f"Partitions ready for years {', '.join(map(str, missing))}")
+
+async def load_known_partitions(conn):
+    rows = await conn.fetch("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = $1
+    """, TABLE)
+    known_partitions.update(
+        int(row["relname"][len(PARTITION_PREFIX):]) for row in rows if row["relname"].startswith(PARTITION_PREFIX)
+    )
+
+async def migrate_legacy_table(conn):
+    # Moves rows from the old single-heap table into the partitioned one,
+    # keeping record_ids. Views built on the old table are dropped with it and
+    # must be recreated afterwards.
+    await conn.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+    await conn.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}")
+    await conn.execute(f"ALTER TABLE {LEGACY_TABLE} RENAME CONSTRAINT {TABLE}_pkey TO {LEGACY_TABLE}_pkey")
+    await conn.execute(f"ALTER SEQUENCE {TABLE}_record_id_seq RENAME TO {LEGACY_TABLE}_record_id_seq")
+    await conn.execute("DROP INDEX IF EXISTS avg_us_securities_natural_key")
+    await conn.execute("DROP INDEX IF EXISTS idx_avg_us_securities_type_date")
+
+    await create_partitioned_table(conn)
+    years = await conn.fetch(f"""
+        SELECT DISTINCT EXTRACT(YEAR FROM record_date)::INT AS year
+        FROM {LEGACY_TABLE}
+        WHERE record_date IS NOT NULL
+    """)
+    await ensure_partitions(conn, [row["year"] for row in years])
+
+    # The legacy table may hold duplicates of the natural key; keep the newest.
+    status = await conn.execute(f"""
+        INSERT INTO {TABLE}(record_id, record_date, security_type_desc, security_desc, avg_interest_rate_amt)
+        SELECT DISTINCT ON (record_date, security_type_desc, security_desc)
+            record_id, record_date, security_type_desc, security_desc, avg_interest_rate_amt
+        FROM {LEGACY_TABLE}
+        WHERE record_date IS NOT NULL
+        ORDER BY record_date, security_type_desc, security_desc, record_id DESC
+    """)
+    legacy_rows = await conn.fetchval(f"SELECT COUNT(*) FROM {LEGACY_TABLE}")
+    await conn.execute(f"""
+        SELECT setval(pg_get_serial_sequence('{TABLE}', 'record_id'),
+                      COALESCE((SELECT MAX(record_id) FROM {TABLE}), 0) + 1, false)
+    """)
+    await conn.execute(f"DROP TABLE {LEGACY_TABLE} CASCADE")
+
+    migrated = int(status.split()[-1])
+    db_logger.info(
+        f"Migrated {migrated} rows into partitioned table, "
+        f"dropped {legacy_rows - migrated} duplicate or undated rows"
+    )
+
+async def create_schema(conn):
+    try:
+        async with conn.transaction():
+            exists = await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", TABLE)
+            if exists and not await is_partitioned(conn):
+                await migrate_legacy_table(conn)
+            else:
+                await create_partitioned_table(conn)
+            await create_indexes(conn)
+    except Exception:
+        known_partitions.clear()
+        raise
+    await load_known_partitions(conn)
+    db_logger.info("Partitioned table created successfully")
@@ -0,0 +1,231 @@
+import os
+import time
+import asyncio
+from datetime import date
+from Logs.logs import db_logger
+from Data.models import EXPORT_COLUMNS, RECORD_COLUMNS, DATE_RECORD_COLUMNS, acquire_conn, date_range, select_list
+from Data.schema import TABLE
+
+# Optional read engine: READ_ENGINE=snapshot keeps the whole table in memory as
+# NumPy columns and answers the /records/* reads from it. NumPy is imported
+# inside the functions so the default Postgres engine never loads it.
+
+EPOCH = date(1970, 1, 1)
+# Reloaded at least this often even without notifications, so a lost
+# listener cannot leave reads on a frozen snapshot. 0 disables.
+SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", "300"))
+
+current_snapshot = None
+refresh_task = None
+refresh_pending = False
+reload_task = None
+
+def snapshot_enabled() -> bool:
+    return os.getenv("READ_ENGINE", "postgres").lower() == "snapshot"
+
+def active_snapshot():
+    return current_snapshot
+
+def to_days(value: date) -> int:
+    return (value - EPOCH).days
+
+def categorical(values):
+    import numpy as np
+
+    # Sorted names with NULL last, matching ORDER BY on the column.
+    names = sorted({value for value in values if value is not None})
+    lookup = {name: code for code, name in enumerate(names)}
+    null_code = len(names)
+    codes = np.fromiter((lookup.get(value, null_code) for value in values), dtype=np.int16, count=len(values))
+    return names + [None], lookup, codes
+
+class Snapshot:
+    def __init__(self, rows):
+        import numpy as np
+
+        self.size = len(rows)
+        self.loaded_at = time.time()
+        # Rows arrive ordered by record_id, so position order is record_id order.
+        self.record_id = np.fromiter((row["record_id"] for row in rows), dtype=np.int64, count=self.size)
+        dates = np.array([row["record_date"] for row in rows], dtype="datetime64[D]")
+        self.record_date = dates.astype(np.int32)
+        self.record_year = np.fromiter((row["record_year"] for row in rows), dtype=np.int32, count=self.size)
+        self.month = ((dates.astype("datetime64[M]") - dates.astype("datetime64[Y]")).astype(np.int32) + 1).astype(np.int8)
+        self.day = ((dates - dates.astype("datetime64[M]")).astype(np.int32) + 1).astype(np.int8)
+        self.type_names, self.type_lookup, self.type_code = categorical([row["security_type_desc"] for row in rows])
+        self.desc_names, _, self.desc_code = categorical([row["security_desc"] for row in rows])
+        # Rates keep the exact NUMERIC values so JSON, CSV and Arrow output is
+        # identical to the Postgres engine; nothing filters on them.
+        self.rate = np.empty(self.size, dtype=object)
+        self.rate[:] = [row["avg_interest_rate_amt"] for row in rows]
+
+        self.by_date = np.argsort(self.record_date, kind="stable")
+        self.sorted_dates = self.record_date[self.by_date]
+        # Per security type: positions in record_id order, the same positions
+        # in date order and their sorted dates for searchsorted.
+        self.by_type = {}
+        for code in np.unique(self.type_code):
+            positions = np.flatnonzero(self.type_code == code)
+            order = positions[np.argsort(self.record_date[positions], kind="stable")]
+            self.by_type[int(code)] = (positions, order, self.record_date[order])
+
+    def column(self, name: str, positions) -> list:
+        if name == "record_id":
+            return self.record_id[positions].tolist()
+        if name == "record_date":
+            return self.record_date[positions].astype("datetime64[D]").tolist()
+        if name == "record_year":
+            return self.record_year[positions].tolist()
+        if name == "security_type_desc":
+            return [self.type_names[code] for code in self.type_code[positions].tolist()]
+        if name == "security_desc":
+            return [self.desc_names[code] for code in self.desc_code[positions].tolist()]
+        return self.rate[positions].tolist()
+
+    def rows(self, positions, fields=None) -> list[dict]:
+        columns = fields or RECORD_COLUMNS
+        values = [self.column(name, positions) for name in columns]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+    def select(self, security_type=None, year=None, month=None, day=None, since=None):
+        import numpy as np
+
+        # Same semantics as build_record_filters: a year becomes a date range,
+        # month/day without a year are matched on every row.
+        if security_type is not None:
+            code = self.type_lookup.get(security_type.strip())
+            if code is None or code not in self.by_type:
+                return np.empty(0, dtype=np.int64)
+            positions, by_date, sorted_dates = self.by_type[code]
+        else:
+            positions, by_date, sorted_dates = np.arange(self.size), self.by_date, self.sorted_dates
+
+        if since is not None:
+            low = np.searchsorted(sorted_dates, to_days(since), side="right")
+            positions, by_date, sorted_dates = np.sort(by_date[low:]), by_date[low:], sorted_dates[low:]
+
+        if year is not None:
+            bounds = date_range(int(year), int(month) if month is not None else None,
+                                int(day) if day is not None and month is not None else None)
+            if bounds is None:
+                return np.empty(0, dtype=np.int64)
+            low, high = np.searchsorted(sorted_dates, [to_days(bounds[0]), to_days(bounds[1])])
+            positions = np.sort(by_date[low:high])
+            if month is not None:
+                month = None
+                day = None
+
+        if month is not None:
+            positions = positions[self.month[positions] == int(month)]
+        if day is not None:
+            positions = positions[self.day[positions] == int(day)]
+        return positions
+
+    def fetch_all_records(self, limit: int, offset: int, fields=None) -> list[dict]:
+        select_list(fields)
+        return self.rows(slice(offset, offset + limit), fields)
+
+    def fetch_records_after(self, after_id: int, limit: int, fields=None) -> list[dict]:
+        import numpy as np
+
+        select_list(fields)
+        start = int(np.searchsorted(self.record_id, after_id, side="right"))
+        return self.rows(slice(start, start + limit), fields)
+
+    def fetch_latest_record(self):
+        if not self.size:
+            return None
+        return self.rows(slice(self.size - 1, self.size))[0]
+
+    def fetch_total_records(self) -> dict:
+        return {"total_records": self.size}
+
+    def fetch_by_security_type(self, security_type: str, fields=None, since=None) -> list[dict]:
+        select_list(fields)
+        return self.rows(self.select(security_type=security_type, since=since), fields)
+
+    def fetch_by_date(self, year=None, month=None, day=None, fields=None) -> list[dict]:
+        import numpy as np
+
+        select_list(fields)
+        positions = self.select(year=year, month=month, day=day)
+        positions = positions[np.argsort(-self.record_date[positions], kind="stable")]
+        return self.rows(positions, fields or DATE_RECORD_COLUMNS)
+
+    def fetch_by_security_type_and_date(self, security_type: str, year=None, month=None, day=None,
+                                        fields=None) -> list[dict]:
+        select_list(fields)
+        return self.rows(self.select(security_type, year, month, day), fields)
+
+    def fetch_by_type(self) -> list[str]:
+        return [self.type_names[code] for code in sorted(self.by_type)]
+
+    async def stream_records(self, security_type=None, year=None, month=None, day=None, fields=EXPORT_COLUMNS,
+                             batch_size: int = 1000):
+        positions = self.select(security_type, year, month, day)
+        for start in range(0, len(positions), batch_size):
+            for row in self.rows(positions[start:start + batch_size], fields):
+                yield row
+            # Lets other requests run between batches of a large export.
+            await asyncio.sleep(0)
+
+async def load_snapshot() -> Snapshot:
+    global current_snapshot
+    started = time.perf_counter()
+    # From the primary: a lagging replica would pin old rows into the snapshot.
+    async with acquire_conn(read=False) as conn:
+        rows = await conn.fetch(f"""
+            SELECT {', '.join(RECORD_COLUMNS)}
+            FROM {TABLE}
+            ORDER BY record_id ASC
+        """)
+    snapshot = Snapshot(rows)
+    # Readers take one reference per request, so replacing it swaps atomically.
+    current_snapshot = snapshot
+    db_logger.info(f"Loaded read snapshot: {snapshot.size} rows in {time.perf_counter() - started:.3f}s")
+    return snapshot
+
+async def refresh_loop(on_refreshed):
+    global refresh_pending
+    while True:
+        refresh_pending = False
+        try:
+            await load_snapshot()
+            on_refreshed()
+        except Exception as e:
+            db_logger.error(f"Snapshot refresh failed, still serving the previous snapshot: {e}", exc_info=True)
+        if not refresh_pending:
+            break
+
+def request_refresh(on_refreshed):
+    # Notifications that arrive during a reload are folded into one more reload.
+    global refresh_task, refresh_pending
+    if refresh_task is not None and not refresh_task.done():
+        refresh_pending = True
+        return
+    refresh_task = asyncio.get_running_loop().create_task(refresh_loop(on_refreshed))
+
+async def reload_when_stale(on_refreshed):
+    while True:
+        age = time.time() - current_snapshot.loaded_at if current_snapshot is not None else SNAPSHOT_MAX_AGE_SECONDS
+        await asyncio.sleep(max(SNAPSHOT_MAX_AGE_SECONDS - age, min(SNAPSHOT_MAX_AGE_SECONDS, 5.0)))
+        if current_snapshot is None or time.time() - current_snapshot.loaded_at >= SNAPSHOT_MAX_AGE_SECONDS:
+            db_logger.info("Read snapshot reached SNAPSHOT_MAX_AGE_SECONDS, reloading")
+            request_refresh(on_refreshed)
+
+def start_periodic_reload(on_refreshed):
+    global reload_task
+    if SNAPSHOT_MAX_AGE_SECONDS > 0 and reload_task is None:
+        reload_task = asyncio.get_running_loop().create_task(reload_when_stale(on_refreshed))
+
+async def stop_refresh():
+    global refresh_task, reload_task
+    for task in (reload_task, refresh_task):
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    refresh_task = None
+    reload_task = None
@@ -0,0 +1,48 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+VALID_SECURITY_TYPES = {"Marketable", "Non-marketable", "Interest-bearing Debt"}
+MAX_RATE = Decimal("100")
+ROW_FIELDS = ("record_date", "security_type_desc", "security_desc", "avg_interest_rate_amt")
+
+class InvalidRecord(ValueError):
+    pass
+
+def parse_rate(raw_value):
+    if raw_value is None or raw_value.strip().lower() in ("", "null"):
+        return None
+    try:
+        percent = Decimal(raw_value.strip().replace("%", ""))
+    except InvalidOperation:
+        raise InvalidRecord(f"avg_interest_rate_amt is not a number: {raw_value!r}")
+    if not percent.is_finite():
+        raise InvalidRecord(f"avg_interest_rate_amt is not finite: {raw_value!r}")
+    rate = percent.scaleb(-2)
+    if abs(rate) >= MAX_RATE:
+        raise InvalidRecord(f"avg_interest_rate_amt out of range: {raw_value!r}")
+    return rate
+
+def parse_item(item: dict):
+    try:
+        record_date = date.fromisoformat(item["record_date"])
+    except KeyError:
+        raise InvalidRecord("record_date is missing")
+    except (TypeError, ValueError):
+        raise InvalidRecord(f"record_date is not an ISO date: {item.get('record_date')!r}")
+
+    security_type = item.get("security_type_desc")
+    if security_type not in VALID_SECURITY_TYPES:
+        raise InvalidRecord(f"unknown security_type_desc: {security_type!r}")
+
+    security_desc = (item.get("security_desc") or "").strip()
+    if not security_desc:
+        raise InvalidRecord("security_desc is missing")
+    if len(security_desc) > 100:
+        raise InvalidRecord("security_desc is longer than 100 characters")
+
+    return (
+        record_date,
+        security_type,
+        security_desc,
+        parse_rate(item.get("avg_interest_rate_amt"))
+    )
@@ -1,40 +1,163 @@
 import os
+import sys
+import json
+import queue
+import atexit
 import logging
+import threading
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 
+env_loaded = False
+
+def load_env():
+    global env_loaded
+    if not env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        env_loaded = True
+
+# Every module imports this one first, so .env is loaded before any module
+# level os.getenv settings (cache, limits, snapshot, listener, logging) are read.
+load_env()
 
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+log_dir = os.getenv("LOG_DIR", parent_dir)
+
+db_log_file_path = os.path.join(log_dir, 'db_logs.log')
+api_log_file_path = os.path.join(log_dir, "api_log.log")
+streamlit_log_file_path = os.path.join(log_dir, "streamlit_log.log")
+
+TEXT_LOG_FORMAT = '%(asctime)s - %(levelname)s - [%(correlation_id)s] %(message)s'
+
+correlation_id: ContextVar = ContextVar("correlation_id", default="-")
+
+def set_correlation_id(value: str):
+    return correlation_id.set(value)
+
+def reset_correlation_id(token):
+    correlation_id.reset(token)
+
+class CorrelationIdFilter(logging.Filter):
+    # Runs in the calling thread, before the record is queued, so the
+    # context variable still holds the request/run id.
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "correlation_id": getattr(record, "correlation_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload)
+
+def build_formatter() -> logging.Formatter:
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_LOG_FORMAT)
+
+def build_handler(path: str) -> logging.Handler:
+    # Several API workers must not rotate the same file: they log to stdout,
+    # or, with LOG_TO_STDOUT=0, each to its own file named after its pid.
+    if os.getenv("LOG_TO_STDOUT") == "1":
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(build_formatter())
+        return handler
+    if os.getenv("LOG_PER_PROCESS") == "1":
+        root, ext = os.path.splitext(path)
+        path = f"{root}.{os.getpid()}{ext}"
+
+    backup_count = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    if os.getenv("LOG_ROTATION", "size").lower() == "time":
+        handler = TimedRotatingFileHandler(
+            path, when=os.getenv("LOG_ROTATE_WHEN", "midnight"), backupCount=backup_count, encoding="utf-8"
+        )
+    else:
+        handler = RotatingFileHandler(
+            path, maxBytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+            backupCount=backup_count, encoding="utf-8"
+        )
+    handler.setFormatter(build_formatter())
+    return handler
+
+def logger_level(name: str) -> int:
+    level_name = os.getenv(f"LOG_LEVEL_{name.upper()}", os.getenv("LOG_LEVEL", "INFO")).upper()
+    level = logging.getLevelName(level_name)
+    return level if isinstance(level, int) else logging.INFO
 
-db_log_file_path = os.path.join(parent_dir, 'db_logs.log')
-api_log_file_path = os.path.join(parent_dir, "api_log.log")
-streamlit_log_file_path = os.path.join(parent_dir,"streamlit_log.log")
+class LazyQueueHandler(QueueHandler):
+    # Records are queued on the calling thread and written by a QueueListener
+    # thread. The log file is only opened when the first record arrives.
+    def __init__(self, path: str):
+        super().__init__(queue.SimpleQueue())
+        self.path = path
+        self.listener = None
+        self.start_lock = threading.Lock()
 
-LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+    def start_listener(self):
+        with self.start_lock:
+            if self.listener is None:
+                self.listener = QueueListener(self.queue, build_handler(self.path), respect_handler_level=True)
+                self.listener.start()
 
-db_logger = logging.getLogger('db_logger')
-db_logger.setLevel(logging.DEBUG)
+    def stop_listener(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
 
+    def prepare(self, record):
+        # Render the message and traceback on the calling thread; the
+        # listener only sees plain strings.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
 
-db_handler = logging.FileHandler(db_log_file_path, mode='a')
-db_handler.setLevel(logging.DEBUG)
-db_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    def emit(self, record):
+        if self.listener is None:
+            self.start_listener()
+        super().emit(record)
 
-db_logger.addHandler(db_handler)
+queue_handlers = []
 
+def build_logger(name: str, path: str) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.setLevel(logger_level(name))
+    logger.propagate = False
+    handler = LazyQueueHandler(path)
+    handler.addFilter(CorrelationIdFilter())
+    logger.addHandler(handler)
+    queue_handlers.append(handler)
+    return logger
 
-api_logger = logging.getLogger('api_logger')
-api_logger.setLevel(logging.DEBUG)
+def use_log_files(prefix: str):
+    # The API and the ingestion job share these loggers; a process that calls
+    # this before logging anything writes to its own prefixed files, so the two
+    # never rotate each other's logs.
+    for handler in queue_handlers:
+        directory, name = os.path.split(handler.path)
+        handler.path = os.path.join(directory, f"{prefix}_{name}")
 
-api_handler = logging.FileHandler(api_log_file_path, mode='a')
-api_handler.setLevel(logging.DEBUG)
-api_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+def shutdown_logging():
+    for handler in queue_handlers:
+        handler.stop_listener()
 
-api_logger.addHandler(api_handler)
+atexit.register(shutdown_logging)
 
-streamlit_logger = logging.getLogger('streamlit_logger')
-streamlit_logger.setLevel(logging.DEBUG)
+db_logger = build_logger('db_logger', db_log_file_path)
 
-streamlit_handler = logging.FileHandler(streamlit_log_file_path, mode='a')
-streamlit_handler.setLevel(logging.DEBUG)
-streamlit_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+api_logger = build_logger('api_logger', api_log_file_path)
 
-streamlit_logger.addHandler(streamlit_handler)
+streamlit_logger = build_logger('streamlit_logger', streamlit_log_file_path)
@@ -0,0 +1,100 @@
+import os
+import glob
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# API
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds", "End-to-end request latency", ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    "api_stage_duration_seconds", "Time spent per request stage (db, convert, serialize)", ["route", "stage"],
+    buckets=LATENCY_BUCKETS
+)
+# With several workers the live gauges are summed across running workers;
+# a dead worker's values are dropped by mark_dead_workers.
+IN_FLIGHT = Gauge("api_requests_in_flight", "Requests currently being handled", multiprocess_mode="livesum")
+RESPONSE_BYTES = Counter("api_response_bytes_total", "Response body bytes sent", ["route"])
+REJECTED_REQUESTS = Counter(
+    "api_requests_rejected_total", "Requests turned away before reaching a handler", ["reason"]
+)
+COALESCED_REQUESTS = Counter("api_requests_coalesced_total", "Requests that joined an identical in-flight query")
+
+POOL_SIZE = Gauge("db_pool_connections", "Open pool connections", ["pool"], multiprocess_mode="livesum")
+POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Pool connections checked out", ["pool"], multiprocess_mode="livesum"
+)
+POOL_WAITING = Gauge(
+    "db_pool_waiting_acquirers", "Coroutines waiting for a pool connection", ["pool"], multiprocess_mode="livesum"
+)
+
+# Ingestion
+PAGES_FETCHED = Counter("ingest_pages_fetched_total", "Fiscal Data API pages fetched")
+FETCH_LATENCY = Histogram(
+    "ingest_fetch_duration_seconds", "Fiscal Data API request latency", ["status"], buckets=LATENCY_BUCKETS
+)
+FETCH_RETRIES = Counter("ingest_fetch_retries_total", "Fiscal Data API request retries", ["reason"])
+ROWS_WRITTEN = Counter("ingest_rows_total", "Rows written by ingestion", ["outcome"])
+BATCH_LATENCY = Histogram("ingest_batch_duration_seconds", "Database batch upsert latency", buckets=LATENCY_BUCKETS)
+ROWS_PER_SECOND = Gauge("ingest_rows_per_second", "Rows written per second over the last run")
+
+current_scope: ContextVar = ContextVar("current_scope", default=None)
+
+def route_label(scope) -> str:
+    if scope is None:
+        return "none"
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+@contextmanager
+def observe_stage(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(route_label(current_scope.get()), stage).observe(time.perf_counter() - started)
+
+def update_pool_gauges(stats: dict):
+    for name, snapshot in stats.items():
+        POOL_SIZE.labels(name).set(snapshot["size"])
+        POOL_IN_USE.labels(name).set(snapshot["in_use"])
+        POOL_WAITING.labels(name).set(snapshot["waiting"])
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def mark_dead_workers(exiting_pid: int = None):
+    # Removes the live gauge files of workers that are gone: the exiting worker
+    # itself on shutdown, and any worker that died without shutting down
+    # (its replacement sweeps them on start-up).
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not directory:
+        return
+    from prometheus_client import multiprocess
+    pids = set()
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        pid = os.path.basename(path)[:-len(".db")].rsplit("_", 1)[-1]
+        if pid.isdigit():
+            pids.add(int(pid))
+    for pid in pids:
+        if pid == exiting_pid or not process_alive(pid):
+            multiprocess.mark_process_dead(pid, directory)
+
+def push_ingestion_metrics(job: str = "treasury_ingestion"):
+    gateway = os.getenv("PROMETHEUS_PUSHGATEWAY_URL")
+    if not gateway:
+        return False
+    from prometheus_client import REGISTRY, push_to_gateway
+    push_to_gateway(gateway, job=job, registry=REGISTRY)
+    return True
@@ -0,0 +1,102 @@
+import time
+import socket
+import asyncio
+from datetime import date, timedelta
+import uvicorn
+from fastapi import FastAPI, Query
+import data
+import db_conn
+from prometheus_client import REGISTRY
+
+MOCK_PATH = "/services/api/fiscal_service/v2/accounting/od/avg_interest_rates"
+TYPES = ["Marketable", "Non-marketable", "Interest-bearing Debt"]
+
+def mock_items(count: int) -> list[dict]:
+    # Dates start after the seeded range so every item is a new row.
+    start = date(2040, 1, 31)
+    return [
+        {
+            "record_date": (start + timedelta(days=31 * (i // 30))).isoformat(),
+            "security_type_desc": TYPES[i % 3],
+            "security_desc": f"Mock Security {i % 30}",
+            "avg_interest_rate_amt": f"{(i % 750) / 100:.3f}",
+        }
+        for i in range(count)
+    ]
+
+def build_mock_api(items: list[dict], latency: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get(MOCK_PATH)
+    async def avg_interest_rates(
+        page_size: int = Query(100, alias="page[size]"),
+        page_number: int = Query(1, alias="page[number]"),
+        filter: str = Query(None),
+    ):
+        selected = items
+        if filter and ":gt:" in filter:
+            since = filter.split(":gt:", 1)[1]
+            selected = [item for item in items if item["record_date"] > since]
+        if latency:
+            await asyncio.sleep(latency)
+        total_pages = (len(selected) + page_size - 1) // page_size
+        start = (page_number - 1) * page_size
+        return {"data": selected[start:start + page_size], "meta": {"total-pages": total_pages}}
+
+    return app
+
+def pages_fetched() -> float:
+    return REGISTRY.get_sample_value("ingest_pages_fetched_total") or 0.0
+
+async def last_run() -> dict:
+    async with db_conn.db_pool.acquire() as conn:
+        row = await conn.fetchrow("""
+            SELECT run_id, status, rows_written, error
+            FROM ingestion_runs
+            ORDER BY started_at DESC
+            LIMIT 1
+        """)
+    return dict(row) if row else {}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def bench_ingestion(rows: int, concurrency: int, latency: float) -> dict:
+    port = free_port()
+    config = uvicorn.Config(build_mock_api(mock_items(rows), latency), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+            raise RuntimeError("Mock Fiscal Data API failed to start")
+        await asyncio.sleep(0.01)
+
+    data.url = f"http://127.0.0.1:{port}{MOCK_PATH}"
+    pages_before = pages_fetched()
+    try:
+        await data.connect_to_db()
+        started = time.perf_counter()
+        # A high request rate keeps the token bucket from being the bottleneck.
+        await data.api_insertion(full=True, concurrency=concurrency, rate=1000.0)
+        elapsed = time.perf_counter() - started
+    finally:
+        server.should_exit = True
+        await serving
+
+    pages = pages_fetched() - pages_before
+    run = await last_run()
+    rows_written = run.get("rows_written", 0)
+    return {
+        "status": run.get("status"),
+        "error": run.get("error"),
+        "rows": rows_written,
+        "pages": int(pages),
+        "concurrency": concurrency,
+        "mock_latency_ms": latency * 1000,
+        "seconds": elapsed,
+        "rows_per_s": rows_written / elapsed,
+        "pages_per_s": pages / elapsed,
+    }
@@ -0,0 +1,44 @@
+import time
+import inspect
+from Data import models
+from timing import summarize
+
+QUERY_CASES = {
+    "fetch_all_records": lambda conn: models.fetch_all_records(conn, limit=100, offset=1000),
+    "fetch_records_after": lambda conn: models.fetch_records_after(conn, after_id=1000, limit=100),
+    "fetch_latest_record": lambda conn: models.fetch_latest_record(conn),
+    "fetch_total_records": lambda conn: models.fetch_total_records(conn),
+    "fetch_by_security_type": lambda conn: models.fetch_by_security_type(conn, "Interest-bearing Debt"),
+    "fetch_by_date": lambda conn: models.fetch_by_date(conn, year=2010, month=6),
+    "fetch_by_security_type_and_date": lambda conn: models.fetch_by_security_type_and_date(
+        conn, "Marketable", year=2015
+    ),
+    "fetch_by_type": lambda conn: models.fetch_by_type(conn),
+    "fetch_type_counts": lambda conn: models.fetch_type_counts(conn),
+    "fetch_security_descs": lambda conn: models.fetch_security_descs(conn),
+    "fetch_rate_series": lambda conn: models.fetch_rate_series(conn, granularity="quarter"),
+    "fetch_resampled_series": lambda conn: models.fetch_resampled_series(
+        conn, ["Marketable", "Non-marketable"], granularity="month"
+    ),
+}
+
+def uncovered_functions() -> list[str]:
+    return sorted(
+        name for name, value in inspect.getmembers(models, inspect.iscoroutinefunction)
+        if name.startswith("fetch_") and name not in QUERY_CASES
+    )
+
+async def bench_queries(iterations: int, names=None) -> list[dict]:
+    results = []
+    for name, case in QUERY_CASES.items():
+        if names and name not in names:
+            continue
+        latencies = []
+        async with models.acquire_conn(read=False) as conn:
+            await case(conn)
+            for _ in range(iterations):
+                started = time.perf_counter()
+                await case(conn)
+                latencies.append(time.perf_counter() - started)
+        results.append({"function": name, **summarize(latencies)})
+    return results
@@ -0,0 +1,46 @@
+import httpx
+from Api.cache import invalidate_cache
+from timing import run_concurrently
+
+ROUTES = [
+    "/records?size=100",
+    "/records?size=100&page=20",
+    "/records/record_count",
+    "/records/latest",
+    "/records/types",
+    "/records/by-date?year=2010&month=6",
+    "/records/by-security-type/?security_type=Interest-bearing%20Debt",
+    "/records/by-security-type/?security_type=Marketable&since=2024-01-01&format=arrow",
+    "/records/by-security-type-and-date?security_type=Marketable&year=2015",
+    "/records/by-security-type-and-date?security_type=Marketable&year=2015&format=arrow",
+    "/records/export?format=ndjson&security_type=Marketable&year=2015",
+    "/stats/counts",
+    "/stats/securities",
+    "/stats/series?granularity=quarter",
+    "/series?security_type=Marketable&security_type=Non-marketable&granularity=month",
+]
+
+async def bench_route(client: httpx.AsyncClient, path: str, requests: int, concurrency: int, cold: bool) -> dict:
+    size = 0
+
+    async def call():
+        nonlocal size
+        if cold:
+            # Drops the response cache so every request reaches the database.
+            invalidate_cache()
+        response = await client.get(path)
+        response.raise_for_status()
+        size = len(response.content)
+
+    await call()
+    result = await run_concurrently(call, requests, concurrency)
+    return {"route": path, "cache": "cold" if cold else "warm", "bytes": size, **result}
+
+async def bench_routes(app, api_key: str, requests: int, concurrency: int, cache_modes, routes=None) -> list[dict]:
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers={"API_KEY": api_key}) as client:
+        for path in routes or ROUTES:
+            for mode in cache_modes:
+                results.append(await bench_route(client, path, requests, concurrency, cold=mode == "cold"))
+    return results
@@ -0,0 +1,81 @@
+import os
+import sys
+import asyncio
+import argparse
+from datetime import date, timedelta
+from decimal import Decimal
+import httpx
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from timing import run_concurrently
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Api.responses import FastJSONResponse, to_columns
+from Data.models import RECORD_COLUMNS
+
+def synthetic_rows(n: int) -> list[dict]:
+    start = date(2001, 1, 31)
+    types = ["Marketable", "Non-marketable", "Interest-bearing Debt"]
+    return [
+        {
+            "record_id": i + 1,
+            "record_date": start + timedelta(days=30 * (i // 12)),
+            "record_year": (start + timedelta(days=30 * (i // 12))).year,
+            "security_type_desc": types[i % 3],
+            "security_desc": f"Security {i % 12}",
+            "avg_interest_rate_amt": Decimal(f"0.{(i * 7919) % 100000:05d}"),
+        }
+        for i in range(n)
+    ]
+
+def build_app(rows: list[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/stdlib")
+    async def stdlib():
+        # The previous behaviour: jsonable_encoder + stdlib json via JSONResponse.
+        return JSONResponse({"Record": jsonable_encoder(rows)})
+
+    @app.get("/orjson")
+    async def fast():
+        return FastJSONResponse({"Record": rows})
+
+    @app.get("/orjson-columns")
+    async def fast_columns():
+        return FastJSONResponse({"Record": to_columns(rows, RECORD_COLUMNS)})
+
+    return app
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> dict:
+    size = 0
+
+    async def call():
+        nonlocal size
+        response = await client.get(path)
+        size = len(response.content)
+
+    result = await run_concurrently(call, requests, concurrency)
+    return {"path": path, **result, "bytes": size}
+
+async def main(rows: int, requests: int, concurrency: int):
+    app = build_app(synthetic_rows(rows))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = [await measure(client, path, requests, concurrency) for path in ("/stdlib", "/orjson", "/orjson-columns")]
+
+    baseline = results[0]["req_per_s"]
+    print(f"{rows} rows, {requests} requests, concurrency {concurrency}")
+    for result in results:
+        print(
+            f"{result['path']:<16} {result['req_per_s']:8.1f} req/s  x{result['req_per_s'] / baseline:4.1f}  "
+            f"p50 {result['p50_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms  {result['bytes'] / 1024:8.1f} KiB"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare JSON serialization paths on large record responses")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.requests, args.concurrency))
@@ -0,0 +1,64 @@
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(output: str, module: str):
+    # `python -X importtime` prints children before their parent, each line as
+    # "import time: self_us | cumulative_us | <indent>name".
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        indent = len(name) - len(name.lstrip())
+        entries.append((indent, int(cumulative), name.strip()))
+
+    for position, (indent, cumulative, name) in enumerate(entries):
+        if name != module:
+            continue
+        children = []
+        for child_indent, child_cumulative, child_name in reversed(entries[:position]):
+            if child_indent <= indent:
+                break
+            if child_indent == indent + 2:
+                children.append((child_cumulative, child_name))
+        return cumulative, sorted(children, reverse=True)
+    raise ValueError(f"{module} not found in importtime output")
+
+def measure(module: str) -> tuple:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root_dir, capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr, module)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the API import time against a start-up budget")
+    parser.add_argument("--module", default="Api.main")
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters to sample; the median is compared")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "750")))
+    parser.add_argument("--top", type=int, default=10, help="Heaviest direct imports to list")
+    args = parser.parse_args()
+
+    # The first run also warms the bytecode and filesystem caches.
+    measure(args.module)
+    samples = [measure(args.module) for _ in range(args.runs)]
+    median_ms = statistics.median(total for total, _ in samples) / 1000
+    _, children = samples[-1]
+
+    print(f"import {args.module}: median {median_ms:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    for cumulative, name in children[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if median_ms > args.budget_ms:
+        print(f"Import time is {median_ms - args.budget_ms:.0f} ms over budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
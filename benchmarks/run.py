@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+sys.path.append(os.path.join(root_dir, "Data"))
+
+RESULTS_DIR = os.path.join(root_dir, "benchmarks", "results")
+BENCH_API_KEY = "benchmark"
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=root_dir, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(previous: dict, current: dict):
+    # Prints p50 changes for every query and route present in both runs.
+    for scale, result in current["scales"].items():
+        before = previous.get("scales", {}).get(scale)
+        if not before:
+            continue
+        print(f"\nScale {scale}x vs {previous.get('commit')} (p50, lower is better)")
+        for section, key in (("queries", "function"), ("routes", "route")):
+            old = {(entry[key], entry.get("cache")): entry for entry in before.get(section, [])}
+            for entry in result.get(section, []):
+                match = old.get((entry[key], entry.get("cache")))
+                if match:
+                    label = entry[key] + (f" [{entry['cache']}]" if "cache" in entry else "")
+                    print(f"  {label:<90} {match['p50_ms']:8.2f} -> {entry['p50_ms']:8.2f} ms "
+                          f"({entry['p50_ms'] / match['p50_ms']:5.2f}x)")
+        if before.get("ingestion") and result.get("ingestion"):
+            print(f"  ingestion rows/s {before['ingestion']['rows_per_s']:10.0f} -> {result['ingestion']['rows_per_s']:10.0f}")
+
+async def main(args):
+    # Imported here so DATABASE_URL and API_KEY are set before the pool and
+    # the API read them.
+    from seed import BASE_ROWS, seed_database
+    from bench_queries import bench_queries, uncovered_functions
+    from bench_routes import bench_routes
+    from bench_ingestion import bench_ingestion
+    from Api.main import app
+    from Api.cache import invalidate_cache
+    from Data.pool import pool_settings
+    from Data.snapshot import load_snapshot, snapshot_enabled
+
+    missing = uncovered_functions()
+    if missing:
+        print(f"Warning: no benchmark case for {', '.join(missing)}")
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "base_rows": BASE_ROWS,
+        "pool": pool_settings(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("database_url", "baseline")},
+        "scales": {},
+    }
+
+    # The API lifespan owns the shared pool for the whole run; seeding and
+    # ingestion reuse it.
+    async with app.router.lifespan_context(app):
+        for scale in args.scales:
+            print(f"Seeding {scale}x ({BASE_ROWS * scale} rows)...")
+            result = await seed_database(scale)
+            if snapshot_enabled():
+                await load_snapshot()
+            invalidate_cache()
+            if not args.skip_queries:
+                print("Timing fetch_* functions...")
+                result["queries"] = await bench_queries(args.iterations)
+            if not args.skip_routes:
+                print("Load testing routes...")
+                result["routes"] = await bench_routes(
+                    app, BENCH_API_KEY, args.requests, args.concurrency, args.cache
+                )
+            if not args.skip_ingestion:
+                print("Measuring ingestion throughput...")
+                result["ingestion"] = await bench_ingestion(
+                    args.ingest_rows, args.ingest_concurrency, args.mock_latency_ms / 1000
+                )
+            report["scales"][str(scale)] = result
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Results written to {args.output}")
+
+    for scale, result in report["scales"].items():
+        print(f"\n{scale}x: {result['rows']} rows seeded in {result['seed_seconds']:.1f}s")
+        for entry in result.get("queries", []):
+            print(f"  {entry['function']:<34} p50 {entry['p50_ms']:8.2f} ms  p99 {entry['p99_ms']:8.2f} ms")
+        for entry in result.get("routes", []):
+            print(
+                f"  {entry['route']:<82} {entry['cache']:<4} {entry['req_per_s']:8.1f} req/s  "
+                f"p50 {entry['p50_ms']:8.2f} ms  p99 {entry['p99_ms']:8.2f} ms"
+            )
+        if "ingestion" in result:
+            ingestion = result["ingestion"]
+            print(
+                f"  ingestion {ingestion['status']}: {ingestion['rows']} rows, {ingestion['pages']} pages in "
+                f"{ingestion['seconds']:.2f}s ({ingestion['rows_per_s']:.0f} rows/s)"
+            )
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark queries, API routes and ingestion against a disposable local Postgres"
+    )
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="Database to seed. Its securities table is dropped and rebuilt (default: BENCH_DATABASE_URL)")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="Dataset sizes as multiples of the live row count")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed calls per fetch_* function")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients per route")
+    parser.add_argument("--cache", nargs="+", choices=["cold", "warm"], default=["cold", "warm"],
+                        help="Measure routes with the response cache cleared before each request, kept, or both")
+    parser.add_argument("--ingest-rows", type=int, default=5000, help="Rows served by the mock Fiscal Data API")
+    parser.add_argument("--ingest-concurrency", type=int, default=4, help="Pages fetched in parallel")
+    parser.add_argument("--mock-latency-ms", type=float, default=20.0, help="Delay added to each mock API page")
+    parser.add_argument("--read-engine", choices=["postgres", "snapshot"], default="postgres",
+                        help="Engine answering the /records/* routes")
+    parser.add_argument("--skip-queries", action="store_true")
+    parser.add_argument("--skip-routes", action="store_true")
+    parser.add_argument("--skip-ingestion", action="store_true")
+    parser.add_argument("--output", default=os.path.join(
+        RESULTS_DIR, f"bench-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json"
+    ))
+    parser.add_argument("--baseline", help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url or BENCH_DATABASE_URL is required; never point this at a production database")
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("DATABASE_READ_URL", None)
+    os.environ["API_KEY"] = BENCH_API_KEY
+    os.environ["READ_ENGINE"] = args.read_engine
+    # The load test sends far more than one client's rate limit; it measures
+    # the routes, not the limiter.
+    os.environ.setdefault("RATE_LIMIT_PER_SECOND", "0")
+    asyncio.run(main(args))
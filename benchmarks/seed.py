@@ -0,0 +1,55 @@
+import time
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+import db_conn
+from Data.schema import TABLE, ensure_partitions, known_partitions
+
+# Roughly the size of the live dataset: one row per security per month since
+# 2001. Scaling multiplies the number of securities, not the date range, so
+# every scale spans the same partitions.
+FIRST_YEAR = 2001
+LAST_YEAR = 2025
+SECURITIES = {
+    "Marketable": ["Treasury Bills", "Treasury Notes", "Treasury Bonds", "Treasury Inflation-Protected Securities",
+                   "Treasury Floating Rate Notes", "Federal Financing Bank", "Total Marketable", "Treasury Strips"],
+    "Non-marketable": ["Domestic Series", "Foreign Series", "State and Local Government Series",
+                       "United States Savings Securities", "Government Account Series", "Total Non-marketable"],
+    "Interest-bearing Debt": ["Total Interest-bearing Debt"],
+}
+BASE_ROWS = (LAST_YEAR - FIRST_YEAR + 1) * 12 * sum(len(descs) for descs in SECURITIES.values())
+
+def month_ends():
+    for year in range(FIRST_YEAR, LAST_YEAR + 1):
+        for month in range(1, 13):
+            next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+            yield next_month - timedelta(days=1)
+
+def synthetic_rows(scale: int, seed: int = 2001):
+    generator = random.Random(seed)
+    for record_date in month_ends():
+        for security_type, descs in SECURITIES.items():
+            for copy in range(scale):
+                for desc in descs:
+                    name = desc if copy == 0 else f"{desc} {copy}"
+                    yield record_date, security_type, name, Decimal(f"{generator.uniform(0.001, 7.5):.5f}")
+
+async def seed_database(scale: int) -> dict:
+    # Rebuilds the schema from scratch with the same DDL the pipeline uses,
+    # then loads the synthetic rows with COPY.
+    started = time.perf_counter()
+    await db_conn.connect_to_db()
+    async with db_conn.db_pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE} CASCADE")
+        await conn.execute("DROP TABLE IF EXISTS ingestion_runs")
+    known_partitions.clear()
+    await db_conn.main()
+
+    rows = list(synthetic_rows(scale))
+    async with db_conn.db_pool.acquire() as conn:
+        await ensure_partitions(conn, range(FIRST_YEAR, LAST_YEAR + 1))
+        await conn.copy_records_to_table(TABLE, records=rows, columns=db_conn.STAGING_COLUMNS)
+        await conn.execute(f"ANALYZE {TABLE}")
+    await db_conn.refresh_summary_views()
+
+    return {"rows": len(rows), "seed_seconds": time.perf_counter() - started}
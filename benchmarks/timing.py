@@ -0,0 +1,31 @@
+import time
+import asyncio
+
+def summarize(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "count": count,
+        "mean_ms": sum(latencies) / count * 1000,
+        "min_ms": latencies[0] * 1000,
+        "p50_ms": latencies[count // 2] * 1000,
+        "p99_ms": latencies[min(count - 1, int(count * 0.99))] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+async def run_concurrently(call, requests: int, concurrency: int) -> dict:
+    # Runs `call` `requests` times from `concurrency` workers and returns the
+    # latency summary plus overall throughput.
+    latencies = []
+    pending = iter(range(requests))
+
+    async def worker():
+        for _ in pending:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"req_per_s": requests / elapsed, **summarize(latencies)}
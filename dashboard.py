@@ -1,6 +1,14 @@
+import os
+import time
+import tempfile
 import streamlit as st
 import requests
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from Logs.logs import streamlit_logger
 
@@ -10,11 +18,38 @@ BASE_API_URL = "https://us-treasury-pipeline.onrender.com"
 API_KEY = st.secrets["API_KEY"]
 HEADERS = {"API_KEY": API_KEY}
 
+# In-memory results are re-checked against the API after CACHE_TTL_SECONDS.
+CACHE_TTL_SECONDS = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "900"))
+CACHE_MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "64"))
+# Per-type Parquet files survive restarts and only need a delta download.
+# A file older than FULL_REFRESH_SECONDS is downloaded again in full so that
+# revised rates for older dates are picked up.
+RECORDS_CACHE_DIR = os.getenv(
+    "DASHBOARD_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".dashboard_cache")
+)
+RECORDS_CACHE_MAX_BYTES = int(float(os.getenv("DASHBOARD_CACHE_MAX_MB", "50")) * 1024 * 1024)
+FULL_REFRESH_SECONDS = int(os.getenv("DASHBOARD_FULL_REFRESH_SECONDS", str(7 * 24 * 3600)))
+REQUEST_WORKERS = int(os.getenv("DASHBOARD_REQUEST_WORKERS", "4"))
+REQUEST_TIMEOUT = float(os.getenv("DASHBOARD_REQUEST_TIMEOUT", "15"))
+
 st.title("Average US Securities Dashboard")
 
-def request_json(url, params=None, timeout=50):
+@st.cache_resource
+def get_session():
+    # One keep-alive connection pool shared by every rerun, so requests reuse
+    # the TLS connection instead of opening a new one each time.
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(8, REQUEST_WORKERS)))
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=max(8, REQUEST_WORKERS)))
+    return session
+
+def request_json(url, params=None, timeout=REQUEST_TIMEOUT, body=None):
     try:
-        resp = requests.get(url, headers=HEADERS, params=params, timeout=timeout)
+        if body is None:
+            resp = get_session().get(url, params=params, timeout=timeout)
+        else:
+            resp = get_session().post(url, json=body, timeout=timeout)
     except requests.exceptions.RequestException as e:
         streamlit_logger.error(f"Request failed: {e}", exc_info=True)
         st.error(f"Network error calling API: {e}")
@@ -34,32 +69,170 @@ def request_json(url, params=None, timeout=50):
         st.error("Invalid JSON response from API.")
         return None
 
-@st.cache_data
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def download_records(session, security_type, since=None):
+    # Runs on worker threads, so it raises instead of calling st.* itself.
+    params = {"security_type": security_type}
+    if since is not None:
+        params["since"] = since.isoformat()
+    resp = session.get(
+        f"{BASE_API_URL}/records/by-security-type/",
+        headers={"Accept": ARROW_STREAM_MEDIA_TYPE}, params=params, timeout=REQUEST_TIMEOUT
+    )
+    resp.raise_for_status()
+    if not resp.headers.get("content-type", "").startswith(ARROW_STREAM_MEDIA_TYPE):
+        return pd.DataFrame(resp.json().get("Record", []))
+    return pa.ipc.open_stream(resp.content).read_pandas()
+
+def records_cache_path(security_type):
+    return os.path.join(RECORDS_CACHE_DIR, f"{quote(security_type, safe='')}.parquet")
+
+def read_cached_records(security_type):
+    path = records_cache_path(security_type)
+    try:
+        table = pq.read_table(path)
+    except FileNotFoundError:
+        return None, 0.0
+    except (OSError, pa.ArrowException) as e:
+        streamlit_logger.warning(f"Discarding unreadable cache file {path}: {e}")
+        remove_cache_file(path)
+        return None, 0.0
+    # Touched on every read so eviction drops the least recently used type.
+    # Another thread's eviction may already have removed it; the table is read.
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    downloaded_at = float((table.schema.metadata or {}).get(b"full_download_at", b"0"))
+    return table.to_pandas(), downloaded_at
+
+def write_cached_records(security_type, df, downloaded_at):
+    os.makedirs(RECORDS_CACHE_DIR, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), b"full_download_at": str(downloaded_at).encode()}
+    table = table.replace_schema_metadata(metadata)
+    # Written to a temporary file first so a concurrent reader never sees a partial file.
+    fd, tmp_path = tempfile.mkstemp(dir=RECORDS_CACHE_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, records_cache_path(security_type))
+    except BaseException:
+        remove_cache_file(tmp_path)
+        raise
+    evict_cached_records()
+
+def remove_cache_file(path) -> bool:
+    # Types are refreshed on parallel threads, so a file can vanish between
+    # listing and removing it.
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def evict_cached_records():
+    entries = []
+    for name in os.listdir(RECORDS_CACHE_DIR):
+        if name.endswith(".parquet"):
+            try:
+                stat = os.stat(os.path.join(RECORDS_CACHE_DIR, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries)[:-1]:
+        if total <= RECORDS_CACHE_MAX_BYTES:
+            break
+        total -= size
+        if remove_cache_file(os.path.join(RECORDS_CACHE_DIR, name)):
+            streamlit_logger.info(f"Evicted {name} from the records cache")
+
+def refresh_records(session, security_type):
+    # Returns (records, error). On a failed download the cached copy is kept.
+    cached, downloaded_at = read_cached_records(security_type)
+    try:
+        if cached is None or cached.empty or time.time() - downloaded_at > FULL_REFRESH_SECONDS:
+            records = download_records(session, security_type)
+            write_cached_records(security_type, records, time.time())
+            return records, None
+        high_water = pd.to_datetime(cached["record_date"]).max().date()
+        delta = download_records(session, security_type, since=high_water)
+        if delta.empty:
+            return cached, None
+        records = pd.concat([cached, delta], ignore_index=True)
+        records = records.drop_duplicates(subset="record_id", keep="last").sort_values("record_id", ignore_index=True)
+        write_cached_records(security_type, records, downloaded_at)
+    except (requests.exceptions.RequestException, ValueError, KeyError, pa.ArrowException, OSError) as e:
+        streamlit_logger.error(f"Refreshing records for {security_type} failed: {e}", exc_info=True)
+        return cached, e
+    streamlit_logger.info(f"Merged {len(delta)} new records for {security_type}")
+    return records, None
+
+def request_batch(queries):
+    payload = request_json(f"{BASE_API_URL}/batch", body={"queries": queries})
+    if not payload or not isinstance(payload, dict):
+        return {}
+    results = {}
+    for query_id, result in payload.get("results", {}).items():
+        if result.get("status") == 200:
+            results[query_id] = result["data"]
+        else:
+            streamlit_logger.error(f"Batch sub-query {query_id} failed: {result}")
+    return results
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES)
+def fetch_summary():
+    # Types, counts and the latest record in a single round trip.
+    return request_batch([
+        {"id": "types", "query": "types"},
+        {"id": "counts", "query": "counts"},
+        {"id": "latest", "query": "latest"},
+    ])
+
 def fetch_security_types():
-    payload = request_json(f"{BASE_API_URL}/records/types")
+    payload = fetch_summary().get("types")
     if not payload:
         return []
     return payload.get("Security_type_desc", []) if isinstance(payload, dict) else []
 
-@st.cache_data
-def fetch_records_for_type(security_type):
-    payload = request_json(f"{BASE_API_URL}/records/by-security-type", params={"security_type": security_type})
-    if not payload:
-        return []
-    return payload.get("Record", payload) if isinstance(payload, dict) else payload
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES)
+def fetch_records(security_types):
+    # One delta request per type, run in parallel over the pooled session.
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=REQUEST_WORKERS) as executor:
+        results = list(executor.map(lambda security_type: refresh_records(session, security_type), security_types))
+    records = {}
+    for security_type, (df, error) in zip(security_types, results):
+        if error is not None:
+            st.warning(f"Could not refresh {security_type} records ({error}); showing cached data.")
+        records[security_type] = df if df is not None else pd.DataFrame()
+    return records
+
+def fetch_type_counts():
+    payload = fetch_summary().get("counts")
+    if not payload or not isinstance(payload, dict):
+        return {}, None
+    counts = {row["security_type_desc"]: row["record_count"] for row in payload.get("Counts", [])}
+    return counts, payload.get("Total")
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES)
+def fetch_series(security_types, granularity="day", year=None, month=None, day=None):
+    params = {"security_type": list(security_types), "granularity": granularity, "agg": "mean"}
+    for name, value in (("year", year), ("month", month), ("day", day)):
+        if value is not None:
+            params[name] = value
+    return request_json(f"{BASE_API_URL}/series", params=params)
 
-@st.cache_data
 def get_latest_records():
-    payload = request_json(f"{BASE_API_URL}/records/latest")
+    payload = fetch_summary().get("latest")
     if payload is None:
         return pd.DataFrame()
     return pd.DataFrame(payload)
 
 def total_count():
-    payload = request_json(f"{BASE_API_URL}/records/record_count")
-    if not payload:
-        return
-    total_records = payload.get("Record_count", {}).get("total_records")
+    _, total_records = fetch_type_counts()
     if total_records is not None:
         st.metric(label="Record Count", value=total_records)
         streamlit_logger.info("Displayed record count card successfully.")
@@ -77,10 +250,7 @@ def card_display():
     if not types:
         st.info("No security types available.")
         return
-    counts = {}
-    for t in types:
-        recs = fetch_records_for_type(t) or []
-        counts[t] = len(recs) if isinstance(recs, list) else 0
+    counts, _ = fetch_type_counts()
     per_row = 3
     rows = (len(types) + per_row - 1) // per_row
     idx = 0
@@ -113,43 +283,22 @@ def line_graph_filtered():
         day_opt = st.selectbox("Day (optional)", options=["All"] + list(range(1, 32)), index=0)
 
 
-        all_data = []
-        for security_type in selected_types:
-
-            records = fetch_records_for_type(security_type) or []
-            for rec in records:
-                rec["security_type"] = security_type
-                all_data.append(rec)
-
-        if not all_data:
-            st.info("No records found for selected types.")
-            return
-
-        df = pd.DataFrame(all_data)
-        if "record_date" not in df.columns or "avg_interest_rate_amt" not in df.columns:
-            st.dataframe(df)
-            return
-
-        df["record_date"] = pd.to_datetime(df["record_date"], errors="coerce")
-        df["avg_interest_rate_amt"] = pd.to_numeric((df["avg_interest_rate_amt"]*100).round(2), errors="coerce")
-        df = df.dropna(subset=["record_date", "avg_interest_rate_amt"])
-
-        if year_opt != "All":
-                df = df[df["record_date"].dt.year == int(year_opt)]
-        if month_opt != "All":
-                df = df[df["record_date"].dt.month == int(month_opt)]
-        if day_opt != "All":
-                df = df[df["record_date"].dt.day == int(day_opt)]
-        if df.empty:
+        payload = fetch_series(
+            tuple(selected_types),
+            year=None if year_opt == "All" else int(year_opt),
+            month=None if month_opt == "All" else int(month_opt),
+            day=None if day_opt == "All" else int(day_opt)
+        )
+        if not payload or not payload.get("dates"):
             st.info("No data to plot.")
             return
 
-        df_pivot = df.pivot_table(
-            index="record_date",
-            columns="security_type",
-            values="avg_interest_rate_amt",
-            aggfunc="mean"
-        ).sort_index()
+        df_pivot = pd.DataFrame(
+            payload["series"],
+            index=pd.to_datetime(payload["dates"])
+        ).mul(100).round(2)
+        df_pivot.index.name = "record_date"
+        df_pivot.columns.name = "security_type"
         st.session_state["line_chart_df"] = df_pivot
 
 
@@ -157,6 +306,25 @@ def line_graph_filtered():
         st.subheader("Persisted Chart")
         st.line_chart(st.session_state["line_chart_df"], width=700, height=300, use_container_width=False)
 
+def display_records():
+    st.subheader("Records")
+    types = fetch_security_types()
+    if not types:
+        st.info("No security types available.")
+        return
+    selected_types = st.multiselect("Security Types", options=types, default=types[:1], key="records_types")
+    if not selected_types:
+        st.info("Select at least one security type.")
+        return
+    records = fetch_records(tuple(selected_types))
+    frames = [records[t] for t in selected_types if not records[t].empty]
+    if not frames:
+        st.write("No records found.")
+        return
+    df = pd.concat(frames, ignore_index=True).sort_values("record_date", ascending=False)
+    st.dataframe(df, width=700, height=300, hide_index=True)
+    st.download_button("Download CSV", df.to_csv(index=False), file_name="avg_us_securities.csv", mime="text/csv")
+
 def render_dashboard():
     col1, col2 = st.columns([1, 3])
     with col1:
@@ -165,4 +333,5 @@ def render_dashboard():
         card_display()
     line_graph_filtered()
     display_latest()
+    display_records()
 render_dashboard()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The ingestion job imports its siblings (db_conn, transform) by bare name.
+sys.path[:0] = [root_dir, os.path.join(root_dir, "Data")]
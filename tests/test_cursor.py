@@ -0,0 +1,36 @@
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+from Api.main import decode_cursor, encode_cursor
+
+def raw_cursor(payload: bytes) -> str:
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+@pytest.mark.parametrize("record_id", [0, 1, 7, 123456789, 2**31 - 1])
+def test_round_trip(record_id):
+    cursor = encode_cursor(record_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == record_id
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    raw_cursor(b"not json"),
+    raw_cursor(b"[]"),
+    raw_cursor(b"{}"),
+    raw_cursor(b'{"id": 5}'),
+    raw_cursor(b'{"record_id": "5"}'),
+    raw_cursor(b'{"record_id": 5.5}'),
+    raw_cursor(b'{"record_id": null}'),
+    raw_cursor(b'{"record_id": true}'),
+    raw_cursor(b'{"record_id": false}'),
+    raw_cursor(b'{"record_id": -1}'),
+    raw_cursor(b'{"record_id": 2147483648}'),
+    raw_cursor(b'{"record_id": 1000000000000000}'),
+])
+def test_rejects_malformed_cursors(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
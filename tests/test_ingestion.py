@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+import data
+
+def valid_item(n: int) -> dict:
+    return {
+        "record_date": "2024-01-31",
+        "security_type_desc": "Marketable",
+        "security_desc": f"Security {n}",
+        "avg_interest_rate_amt": "1.0",
+    }
+
+class FakeStore:
+    # Stands in for the database: records the checkpoint sent with every write
+    # and can fail a chosen write.
+    def __init__(self, fail_on_call: int = None):
+        self.fail_on_call = fail_on_call
+        self.calls = 0
+        self.checkpoints = []
+        self.rows = []
+        self.dead_letters = []
+
+    async def write_batch(self, batch, checkpoint=None):
+        self.calls += 1
+        self.checkpoints.append(checkpoint[1])
+        if self.calls == self.fail_on_call:
+            raise TimeoutError("simulated command timeout")
+        self.rows.extend(batch)
+        return len(batch), 0, 0
+
+    async def insert_dead_letters(self, run_id, entries):
+        self.dead_letters.extend(entries)
+        return len(entries)
+
+@pytest.fixture
+def store(monkeypatch):
+    fake = FakeStore()
+    monkeypatch.setattr(data, "write_batch", fake.write_batch)
+    monkeypatch.setattr(data, "insert_dead_letters", fake.insert_dead_letters)
+    return fake
+
+def stats():
+    return data.StageStats("test", "rows")
+
+async def queued(*messages) -> asyncio.Queue:
+    queue = asyncio.Queue()
+    for message in messages:
+        await queue.put(message)
+    await queue.put(None)
+    return queue
+
+async def drain(queue: asyncio.Queue) -> list:
+    messages = []
+    while (message := queue.get_nowait()) is not None:
+        messages.append(message)
+    return messages
+
+def run_parse(pages, batch_size):
+    async def run():
+        page_queue = await queued(*pages)
+        batch_queue = asyncio.Queue()
+        await data.parse_stage(page_queue, batch_queue, stats(), batch_size=batch_size)
+        return await drain(batch_queue)
+    return asyncio.run(run())
+
+def run_write(messages, start_page=1):
+    async def run():
+        return await data.write_stage(await queued(*messages), "run-test", stats(), start_page=start_page)
+    return asyncio.run(run())
+
+def test_parse_stage_reports_a_page_only_with_its_last_row():
+    messages = run_parse([(1, [valid_item(n) for n in range(3)]), (2, [valid_item(3)])], batch_size=2)
+    assert [(kind, len(rows), pages) for kind, rows, pages in messages] == [
+        ("rows", 2, []),
+        ("rows", 2, [1, 2]),
+    ]
+
+def test_parse_stage_flushes_the_remainder_and_empty_pages():
+    messages = run_parse([(1, [valid_item(0)]), (2, [])], batch_size=5)
+    assert [(kind, len(rows), pages) for kind, rows, pages in messages] == [("rows", 1, [1, 2])]
+
+def test_parse_stage_dead_letters_invalid_items():
+    bad = dict(valid_item(1), security_type_desc="Bonds")
+    messages = run_parse([(1, [valid_item(0), bad])], batch_size=5)
+    assert messages[0][0] == "dead"
+    assert messages[0][1][0][0] == bad
+    assert [(kind, len(rows), pages) for kind, rows, pages in messages[1:]] == [("rows", 1, [1])]
+
+def test_checkpoint_only_advances_over_contiguous_pages(store):
+    totals = run_write([("rows", ["a"], [2]), ("rows", ["b"], [1]), ("rows", ["c"], [4]), ("rows", ["d"], [3])])
+    assert store.checkpoints == [0, 2, 2, 4]
+    assert totals["inserted"] == 4
+
+def test_checkpoint_starts_after_the_resumed_page(store):
+    run_write([("rows", ["a"], [7]), ("rows", ["b"], [6])], start_page=6)
+    assert store.checkpoints == [5, 7]
+
+def test_batches_without_completed_pages_keep_the_checkpoint(store):
+    run_write([("rows", ["a"], []), ("rows", ["b"], [1]), ("rows", [], [2])])
+    assert store.checkpoints == [0, 1, 2]
+
+def test_failed_write_propagates_and_is_not_dead_lettered(store):
+    store.fail_on_call = 3
+    with pytest.raises(TimeoutError):
+        run_write([("rows", ["a"], [1]), ("rows", ["b"], [3]), ("rows", ["c"], [2]), ("rows", ["d"], [4])])
+    # Only the first two writes committed, so the last checkpoint saved is page 1.
+    assert store.checkpoints[:2] == [1, 1]
+    assert store.rows == ["a", "b"]
+    assert store.dead_letters == []
+
+def test_dead_letters_are_counted(store):
+    totals = run_write([("dead", [({"bad": 1}, "reason")], []), ("rows", ["a"], [1])])
+    assert totals["dead_lettered"] == 1
+    assert store.checkpoints == [1]
+
+def test_pipeline_checkpoints_pages_arriving_out_of_order(store):
+    async def run():
+        page_queue = await queued(
+            (3, [valid_item(n) for n in range(30, 33)]),
+            (1, [valid_item(n) for n in range(10, 13)]),
+            (2, [valid_item(n) for n in range(20, 23)]),
+        )
+        batch_queue = asyncio.Queue()
+        async with asyncio.TaskGroup() as group:
+            group.create_task(data.parse_stage(page_queue, batch_queue, stats(), batch_size=2))
+            writer = group.create_task(data.write_stage(batch_queue, "run-test", stats()))
+        return writer.result()
+
+    totals = asyncio.run(run())
+    assert totals["inserted"] == 9
+    assert len(store.rows) == 9
+    assert store.checkpoints == sorted(store.checkpoints)
+    assert store.checkpoints[-1] == 3
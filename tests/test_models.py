@@ -0,0 +1,53 @@
+from datetime import date
+
+import pytest
+
+from Data.models import build_record_filters, date_range
+
+@pytest.mark.parametrize("args, expected", [
+    ((2024,), (date(2024, 1, 1), date(2025, 1, 1))),
+    ((2024, 2), (date(2024, 2, 1), date(2024, 3, 1))),
+    ((2024, 12), (date(2024, 12, 1), date(2025, 1, 1))),
+    ((2024, 2, 29), (date(2024, 2, 29), date(2024, 3, 1))),
+    ((2024, 12, 31), (date(2024, 12, 31), date(2025, 1, 1))),
+])
+def test_date_range_is_half_open(args, expected):
+    assert date_range(*args) == expected
+
+@pytest.mark.parametrize("args", [(2023, 2, 29), (2024, 13), (2024, 4, 31), (2024, 0)])
+def test_date_range_rejects_impossible_dates(args):
+    assert date_range(*args) is None
+
+def test_no_filters():
+    assert build_record_filters() == ([], [])
+
+def test_security_type_is_stripped():
+    assert build_record_filters(security_type=" Marketable ") == (["security_type_desc = $1"], ["Marketable"])
+
+def test_year_month_day_become_one_date_range():
+    conditions, params = build_record_filters(year=2024, month=2, day=29)
+    assert conditions == ["record_date >= $1 AND record_date < $2"]
+    assert params == [date(2024, 2, 29), date(2024, 3, 1)]
+
+def test_day_without_month_is_extracted_within_the_year():
+    conditions, params = build_record_filters(year=2024, day=15)
+    assert conditions == ["record_date >= $1 AND record_date < $2", "EXTRACT(DAY FROM record_date) = $3"]
+    assert params == [date(2024, 1, 1), date(2025, 1, 1), 15]
+
+def test_month_and_day_without_year_are_extracted():
+    conditions, params = build_record_filters(month="3", day="7")
+    assert conditions == ["EXTRACT(MONTH FROM record_date) = $1", "EXTRACT(DAY FROM record_date) = $2"]
+    assert params == [3, 7]
+
+def test_impossible_date_matches_nothing():
+    conditions, _ = build_record_filters(security_type="Marketable", year=2023, month=2, day=29)
+    assert conditions[-1] == "FALSE"
+
+def test_placeholders_continue_from_param_index():
+    conditions, params = build_record_filters(
+        security_type="Marketable", year=2024, since=date(2024, 6, 1), param_index=3
+    )
+    assert conditions == [
+        "security_type_desc = $3", "record_date > $4", "record_date >= $5 AND record_date < $6"
+    ]
+    assert params == ["Marketable", date(2024, 6, 1), date(2024, 1, 1), date(2025, 1, 1)]
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from Api.series import lttb_indices
+
+@pytest.mark.parametrize("threshold", [0, 2, 10, 50])
+def test_short_series_or_small_threshold_keeps_every_point(threshold):
+    assert lttb_indices(np.arange(10, dtype=float), threshold).tolist() == list(range(10))
+
+@pytest.mark.parametrize("n, threshold", [(10, 3), (100, 7), (1000, 50), (1001, 999)])
+def test_keeps_endpoints_and_picks_increasing_indices(n, threshold):
+    y = np.sin(np.arange(n) / 7.0)
+    indices = lttb_indices(y, threshold)
+    assert len(indices) == threshold
+    assert indices[0] == 0
+    assert indices[-1] == n - 1
+    assert np.all(np.diff(indices) > 0)
+
+def test_keeps_spikes():
+    y = np.zeros(100)
+    y[37] = 10.0
+    y[71] = -10.0
+    indices = lttb_indices(y, 10).tolist()
+    assert 37 in indices
+    assert 71 in indices
+
+def test_picks_the_largest_triangle_in_each_bucket():
+    y = np.array([0.0, 1.0, 5.0, 1.0, 0.0, -4.0, 0.0, 0.0])
+    assert lttb_indices(y, 4).tolist() == [0, 2, 5, 7]
@@ -0,0 +1,95 @@
+import re
+import itertools
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from Data.models import build_record_filters
+from Data.snapshot import Snapshot
+
+TYPES = ["Marketable", "Non-marketable", "Interest-bearing Debt", None]
+
+def make_rows():
+    # Month-end and mid-month dates over three years, including a leap day,
+    # cycling through the security types; record_id order differs from date order.
+    dates = []
+    day = date(2019, 12, 1)
+    while day < date(2022, 3, 1):
+        dates.extend([day, day + timedelta(days=14)])
+        day = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    dates.append(date(2020, 2, 29))
+    dates.sort(key=lambda value: (value.day, value))
+    return [
+        {
+            "record_id": record_id,
+            "record_date": record_date,
+            "record_year": record_date.year,
+            "security_type_desc": TYPES[record_id % len(TYPES)],
+            "security_desc": f"Security {record_id % 3}",
+            "avg_interest_rate_amt": Decimal(record_id) / 100,
+        }
+        for record_id, record_date in enumerate(dates, start=1)
+    ]
+
+ROWS = make_rows()
+
+def sql_match(row: dict, conditions: list[str], params: list) -> bool:
+    # Evaluates the conditions build_record_filters generates, the way Postgres would.
+    def param(placeholder):
+        return params[int(placeholder) - 1]
+
+    for condition in conditions:
+        if condition == "FALSE":
+            return False
+        if match := re.fullmatch(r"security_type_desc = \$(\d+)", condition):
+            ok = row["security_type_desc"] is not None and row["security_type_desc"] == param(match[1])
+        elif match := re.fullmatch(r"record_date > \$(\d+)", condition):
+            ok = row["record_date"] > param(match[1])
+        elif match := re.fullmatch(r"record_date >= \$(\d+) AND record_date < \$(\d+)", condition):
+            ok = param(match[1]) <= row["record_date"] < param(match[2])
+        elif match := re.fullmatch(r"EXTRACT\(MONTH FROM record_date\) = \$(\d+)", condition):
+            ok = row["record_date"].month == param(match[1])
+        elif match := re.fullmatch(r"EXTRACT\(DAY FROM record_date\) = \$(\d+)", condition):
+            ok = row["record_date"].day == param(match[1])
+        else:
+            raise AssertionError(f"Unexpected condition: {condition}")
+        if not ok:
+            return False
+    return True
+
+@pytest.fixture(scope="module")
+def snapshot():
+    return Snapshot(ROWS)
+
+FILTERS = list(itertools.product(
+    [None, "Marketable", " Non-marketable ", "Unknown"],
+    [None, 2020, 2021, 2030],
+    [None, 2, 12],
+    [None, 1, 15, 29, 31],
+    [None, date(2020, 6, 15)],
+))
+
+@pytest.mark.parametrize("security_type, year, month, day, since", FILTERS)
+def test_select_matches_sql_filters(snapshot, security_type, year, month, day, since):
+    conditions, params = build_record_filters(security_type, year, month, day, since=since)
+    expected = [row["record_id"] for row in ROWS if sql_match(row, conditions, params)]
+    positions = snapshot.select(security_type, year, month, day, since=since)
+    assert snapshot.record_id[positions].tolist() == expected
+
+def test_rows_round_trip(snapshot):
+    assert snapshot.rows(slice(0, len(ROWS))) == ROWS
+
+def test_fetch_by_date_is_newest_first(snapshot):
+    records = snapshot.fetch_by_date(year=2021)
+    dates = [record["record_date"] for record in records]
+    assert dates == sorted(dates, reverse=True)
+    assert len(records) == sum(row["record_year"] == 2021 for row in ROWS)
+
+def test_fetch_records_after(snapshot):
+    records = snapshot.fetch_records_after(after_id=10, limit=3, fields=["record_id"])
+    assert records == [{"record_id": 11}, {"record_id": 12}, {"record_id": 13}]
+
+def test_fetch_by_type_sorts_null_last(snapshot):
+    # Same order as SELECT DISTINCT ... ORDER BY security_type_desc.
+    assert snapshot.fetch_by_type() == sorted(name for name in TYPES if name is not None) + [None]
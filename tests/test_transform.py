@@ -0,0 +1,58 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from transform import InvalidRecord, parse_item
+
+def item(**overrides):
+    values = {
+        "record_date": "2024-02-29",
+        "security_type_desc": "Marketable",
+        "security_desc": "Treasury Bills",
+        "avg_interest_rate_amt": "5.123",
+    }
+    values.update(overrides)
+    return values
+
+def test_parses_a_valid_item():
+    assert parse_item(item()) == (date(2024, 2, 29), "Marketable", "Treasury Bills", Decimal("0.05123"))
+
+def test_strips_security_desc():
+    assert parse_item(item(security_desc="  Treasury Notes "))[2] == "Treasury Notes"
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1.5%", Decimal("0.015")),
+    (" 2 ", Decimal("0.02")),
+    ("-0.25", Decimal("-0.0025")),
+    ("null", None),
+    ("NULL", None),
+    ("", None),
+    (None, None),
+])
+def test_parses_rates(raw, expected):
+    assert parse_item(item(avg_interest_rate_amt=raw))[3] == expected
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"record_date": None}, "record_date is not an ISO date"),
+    ({"record_date": "2023-02-29"}, "record_date is not an ISO date"),
+    ({"record_date": "02/01/2024"}, "record_date is not an ISO date"),
+    ({"security_type_desc": "Bonds"}, "unknown security_type_desc"),
+    ({"security_type_desc": None}, "unknown security_type_desc"),
+    ({"security_desc": "   "}, "security_desc is missing"),
+    ({"security_desc": None}, "security_desc is missing"),
+    ({"security_desc": "x" * 101}, "longer than 100 characters"),
+    ({"avg_interest_rate_amt": "abc"}, "is not a number"),
+    ({"avg_interest_rate_amt": "NaN"}, "is not finite"),
+    ({"avg_interest_rate_amt": "Infinity"}, "is not finite"),
+    ({"avg_interest_rate_amt": "10000"}, "out of range"),
+])
+def test_rejects_invalid_items(overrides, message):
+    with pytest.raises(InvalidRecord, match=message):
+        parse_item(item(**overrides))
+
+def test_rejects_missing_record_date():
+    values = item()
+    del values["record_date"]
+    with pytest.raises(InvalidRecord, match="record_date is missing"):
+        parse_item(values)